@@ -6,7 +6,7 @@ from sqlmodel import Session, select
 from app.core.db import get_session
 from app.core.security import verify_password, get_password_hash, create_access_token
 from app.models import UserProfile
-from app.api.deps import get_current_user
+from app.api.deps import CurrentUser, get_current_user
 
 router = APIRouter()
 
@@ -88,7 +88,7 @@ def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: UserProfile = Depends(get_current_user)):
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Get current authenticated user."""
     return UserResponse(
         id=current_user.id,
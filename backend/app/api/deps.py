@@ -1,18 +1,79 @@
+import time
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect
 from sqlmodel import Session, select
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.db import get_session
+from app.core.db import engine
 from app.models import UserProfile
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> UserProfile:
+@dataclass(frozen=True)
+class CurrentUser:
+    """Snapshot of the authenticated user; safe to share between requests and threads."""
+    id: int
+    username: str
+    email: Optional[str] = None
+
+# token -> username of tokens that passed signature and expiry checks
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+# username -> CurrentUser. Other worker processes don't see the invalidation below,
+# there a changed or deleted user stays cached for up to AUTH_CACHE_TTL seconds.
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+@event.listens_for(UserProfile, "after_update")
+@event.listens_for(UserProfile, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: UserProfile):
+    """Drops this process's snapshot of a changed user, including under a username it just gave up."""
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    for username in usernames:
+        _user_cache.pop(username)
+
+def auth_cache_stats() -> dict:
+    return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
+
+def _username_from_token(token: str) -> Optional[str]:
+    """Username (`sub`) of a valid token, None if it is invalid or expired."""
+    username = _token_cache.get(token)
+    if username is not None:
+        return username
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    # Never outlive the token itself
+    ttl = min(settings.AUTH_CACHE_TTL, payload.get("exp", float("inf")) - time.time())
+    if ttl > 0:
+        _token_cache.set(token, username, ttl=ttl)
+    return username
+
+def _get_user(username: str) -> Optional[CurrentUser]:
+    """The database is only queried (with a short-lived session) on a cache miss."""
+    user = _user_cache.get(username)
+    if user is not None:
+        return user
+
+    with Session(engine) as session:
+        profile = session.exec(select(UserProfile).where(UserProfile.username == username)).first()
+        if profile is None:
+            return None
+        user = CurrentUser(id=profile.id, username=profile.username, email=profile.email)
+
+    if settings.AUTH_CACHE_TTL > 0:
+        _user_cache.set(username, user)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
     """Get current authenticated user from JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,24 +81,17 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = _username_from_token(token)
+    if username is None:
         raise credentials_exception
     
-    user = session.exec(select(UserProfile).where(UserProfile.username == username)).first()
+    user = _get_user(username)
     if user is None:
         raise credentials_exception
     
     return user
 
-async def get_current_user_optional(
-    request: Request,
-    session: Session = Depends(get_session)
-) -> Optional[UserProfile]:
+async def get_current_user_optional(request: Request) -> Optional[CurrentUser]:
     """Get current authenticated user from JWT token, returns None if not authenticated."""
     authorization = request.headers.get("Authorization")
     if not authorization:
@@ -51,14 +105,8 @@ async def get_current_user_optional(
     except ValueError:
         return None
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-    except JWTError:
+    username = _username_from_token(token)
+    if username is None:
         return None
     
-    user = session.exec(select(UserProfile).where(UserProfile.username == username)).first()
-    return user
-
+    return _get_user(username)
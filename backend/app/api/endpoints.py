@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 from functools import lru_cache
+import asyncio
+import base64
 import logging
 import json
+from sqlalchemy import and_, func, or_
 from sqlmodel import Session, select
 
 from app.services.downloader import DownloaderService
@@ -12,19 +17,34 @@ from app.services.transcriber import TranscriberService
 from app.services.analyzer import AnalyzerService
 from app.services.generator import GeneratorService
 from app.services.profile_builder import ProfileBuilderService
-from app.core.db import get_session
-from app.models import UserProfile, VideoAnalysis
-from app.api.deps import get_current_user_optional
+from app.services.profile_scheduler import ProfileRebuildScheduler
+from app.services.analysis_pipeline import AnalysisPipeline
+from app.services.job_runner import AnalysisJobRunner
+from app.services.result_cache import AnalysisResultCacheService
+from app.services.transcript_store import TranscriptStore
+from app.services.storage import StorageManager
+from app.core.config import settings
+from app.core.executors import ExecutorOverloaded, get_executor, executor_stats
+from app.core.db import engine, get_session
+from app.models import UserProfile, VideoAnalysis, AnalysisJob, AnalysisBatch
+from app.api.deps import CurrentUser, get_current_user_optional, auth_cache_stats
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 class AnalyzeRequest(BaseModel):
     url: str
+    force: bool = False  # Re-run the full analysis even if a cached result exists
 
 class GenerateRequest(BaseModel):
     username: str
     topic: str
+    regenerate: bool = False  # Ask the model again instead of returning the cached script
+
+class GenerateBatchRequest(BaseModel):
+    username: str
+    topics: List[str] = Field(min_length=1, max_length=settings.GENERATE_BATCH_MAX_TOPICS)
+    regenerate: bool = False
 
 class Segment(BaseModel):
     start: float
@@ -45,22 +65,91 @@ class AnalyzeResponse(BaseModel):
     paths: Paths
     style_passport: Optional[Dict[str, Any]] = None
     meta_stats: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, Any]] = None  # Per-stage durations and critical path
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | completed | failed
+    url: str
+    error: Optional[str] = None
+    result: Optional[AnalyzeResponse] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BulkAnalyzeRequest(BaseModel):
+    urls: List[str] = []
+    channel_url: Optional[str] = None  # Channel or playlist, expanded into its videos
+    limit: Optional[int] = None  # Newest N videos of the channel
+    force: bool = False
+
+class BulkSubmitResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+
+class BulkJobItem(BaseModel):
+    job_id: str
+    url: str
+    status: str
+    error: Optional[str] = None
+    video_id: Optional[int] = None
+
+class BulkStatusResponse(BaseModel):
+    batch_id: str
+    status: str  # running | completed
+    source: Optional[str] = None
+    total: int
+    counts: Dict[str, int]  # jobs per status
+    jobs: List[BulkJobItem]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
 class GenerateResponse(BaseModel):
     status: str
     script_data: Dict[str, Any]
 
+class GenerateBatchItem(BaseModel):
+    topic: str
+    status: str  # success | error
+    script_data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class GenerateBatchResponse(BaseModel):
+    status: str
+    results: List[GenerateBatchItem]
+
+class VideoListItem(BaseModel):
+    id: int
+    title: str
+    url: str
+    views: int
+    likes: int
+    platform: str
+    created_at: datetime
+
+class VideoListResponse(BaseModel):
+    videos: List[VideoListItem]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to get the next page, None on the last one
+
 class ProfileResponse(BaseModel):
     username: str
     master_profile: Dict
+    profile_version: int = 0  # Changes every time the Master Profile is updated
     videos_count: int
-    videos: List[Dict]
+    videos: List[VideoListItem]  # First page, newest first
+    next_cursor: Optional[str] = None  # Continue with GET /profile/{username}/videos
 
 class VideoResponse(BaseModel):
     status: str
     video_id: int
     username: str
     transcript_text: str  # Will be empty if not stored
+    segments: List[Segment] = []
     style_passport: Optional[Dict[str, Any]] = None
     meta_stats: Optional[Dict[str, Any]] = None
     youtube_url: str
@@ -86,104 +175,226 @@ def get_generator_service():
 def get_profile_builder_service():
     return ProfileBuilderService()
 
+@lru_cache()
+def get_profile_scheduler():
+    return ProfileRebuildScheduler(profile_builder_factory=get_profile_builder_service)
+
+def get_result_cache_service():
+    return AnalysisResultCacheService()
+
+def get_transcript_store():
+    return TranscriptStore()
+
+def get_storage_manager():
+    return StorageManager()
+
+def get_analysis_pipeline():
+    return AnalysisPipeline(
+        downloader=get_downloader_service(),
+        video_processor=get_video_processing_service(),
+        transcriber=get_transcriber_service(),
+        analyzer=get_analyzer_service(),
+        profile_scheduler=get_profile_scheduler(),
+        result_cache=get_result_cache_service(),
+        transcript_store=get_transcript_store(),
+        storage=get_storage_manager()
+    )
+
+@lru_cache()
+def get_job_runner():
+    return AnalysisJobRunner(pipeline_factory=get_analysis_pipeline, profile_scheduler=get_profile_scheduler())
+
+def _overloaded(error: ExecutorOverloaded) -> HTTPException:
+    """503 with a Retry-After estimated from the queue, instead of letting latency grow without limit."""
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @router.post("/analyze", response_model=AnalyzeResponse)
-def analyze_video(
+async def analyze_video(
     request: AnalyzeRequest,
-    session: Session = Depends(get_session),
-    current_user: Optional[UserProfile] = Depends(get_current_user_optional),
-    downloader: DownloaderService = Depends(get_downloader_service),
-    video_processor: VideoProcessingService = Depends(get_video_processing_service),
-    transcriber: TranscriberService = Depends(get_transcriber_service),
-    analyzer: AnalyzerService = Depends(get_analyzer_service),
-    profile_builder: ProfileBuilderService = Depends(get_profile_builder_service)
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional),
+    pipeline: AnalysisPipeline = Depends(get_analysis_pipeline)
 ):
     """
-    Analyze video: Download -> Extract -> Transcribe -> AI Analyze -> Save to DB -> Update Profile.
+    Analyze video: Download -> Extract -> Transcribe -> AI Analyze -> Save to DB.
+    The Master Profile is updated in the background afterwards (see profile_version).
+    Already analyzed videos are returned from the result cache unless `force` is set.
+    Full runs go to the dedicated "analyze" executor; 503 with Retry-After when its queue is full.
     """
     logger.info(f"Received analyze request for URL: {request.url}")
+    current_user_id = current_user.id if current_user else None
+
+    def serve_cached() -> Optional[dict]:
+        with Session(engine) as session:
+            return pipeline.run_cached(request.url, session, current_user_id=current_user_id)
+
+    def run_analysis() -> dict:
+        # Own session: the analysis keeps running if the client disconnects,
+        # after the request-scoped session has already been closed
+        with Session(engine) as session:
+            return pipeline.run(request.url, session, current_user_id=current_user_id, force=request.force)
+
     try:
-        # 1. Download
-        logger.info("Step 1/5: Downloading video...")
-        download_result = downloader.download(request.url)
-        video_path = download_result["video_path"]
-        video_id_str = download_result["video_id"] # YouTube ID string
-        
-        video_stats = {
-            "view_count": download_result.get("view_count", 0),
-            "like_count": download_result.get("like_count", 0),
-            "comment_count": download_result.get("comment_count", 0),
-            "uploader": download_result.get("uploader", "Unknown"),
-            "title": download_result.get("title", "Unknown"),
-            "duration": download_result.get("duration", 0),
-            "platform": download_result.get("platform", "Unknown")  # Add platform to stats
-        }
-        
-        # 2. Extract
-        logger.info("Step 2/5: Processing video...")
-        audio_path = video_processor.extract_audio(video_path, video_id_str)
-        frames_dir = video_processor.extract_frames(video_path, video_id_str)
-        
-        # 3. Transcribe
-        logger.info("Step 3/5: Transcribing...")
-        transcript_result = transcriber.transcribe(audio_path)
-        
-        # 4. Analyze & Save to DB
-        logger.info("Step 4/5: Analyzing style & saving...")
-        analysis_result = analyzer.analyze_video_style(
-            transcript_text=transcript_result["text"],
-            frames_dir=frames_dir,
-            stats=video_stats,
-            video_url=request.url,
-            session=session,
-            current_user_id=current_user.id if current_user else None
-        )
-        
-        # Check if analysis failed
-        if "error" in analysis_result:
-            error_msg = analysis_result.get("error", "Unknown error during analysis")
-            logger.error(f"Analysis failed: {error_msg}")
-            raise Exception(f"Video analysis failed: {error_msg}")
-        
-        db_video_id = analysis_result.get("video_id")
-        db_user_id = analysis_result.get("user_id")
-        username = analysis_result.get("username")
-        style_passport = analysis_result.get("passport")
-        
-        # Validate that we have required fields
-        if not db_video_id or not username:
-            error_msg = analysis_result.get("error", "Analysis completed but missing required fields")
-            logger.error(f"Analysis incomplete: video_id={db_video_id}, username={username}")
-            raise Exception(f"Video analysis incomplete: {error_msg}")
-
-        # 5. Update Master Profile
-        logger.info("Step 5/5: Updating Master Profile...")
-        if db_user_id:
-            profile_builder.update_master_profile(db_user_id, session)
-
-        logger.info("Analysis flow completed successfully.")
-        
-        # Use current user's username instead of uploader_name
-        response_username = current_user.username if current_user else username
-        
-        return AnalyzeResponse(
-            status="success",
-            video_id=db_video_id,
-            username=response_username,
-            transcript_text=transcript_result["text"],
-            segments=transcript_result["segments"],
-            paths=Paths(
-                video=str(video_path),
-                audio=str(audio_path),
-                frames=str(frames_dir)
-            ),
-            style_passport=style_passport,
-            meta_stats=video_stats
-        )
+        # Cache hits never queue behind running analyses on the "analyze" executor
+        result = None if request.force else await asyncio.to_thread(serve_cached)
+        if result:
+            return AnalyzeResponse(**result)
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed, running the full analysis: {e}")
+
+    try:
+        future = get_executor("analyze").try_submit(run_analysis)
+    except ExecutorOverloaded as e:
+        raise _overloaded(e)
+
+    try:
+        result = await asyncio.wrap_future(future)
+        return AnalyzeResponse(**result)
 
     except Exception as e:
         logger.error(f"Error during analysis: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze/jobs", response_model=JobSubmitResponse, status_code=202)
+def submit_analysis_job(
+    request: AnalyzeRequest,
+    session: Session = Depends(get_session),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional),
+    job_runner: AnalysisJobRunner = Depends(get_job_runner)
+):
+    """
+    Queue a video for background analysis. Returns a job id immediately;
+    poll GET /analyze/jobs/{job_id} for status and results.
+    """
+    logger.info(f"Received analyze job request for URL: {request.url}")
+    try:
+        job = job_runner.create_job(
+            request.url,
+            session,
+            user_id=current_user.id if current_user else None,
+            force=request.force
+        )
+    except ExecutorOverloaded as e:
+        raise _overloaded(e)
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+@router.get("/analyze/jobs/{job_id}", response_model=JobStatusResponse)
+def get_analysis_job(
+    job_id: str,
+    session: Session = Depends(get_session),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
+):
+    """
+    Get status of a background analysis job. `result` is filled once the job is completed.
+    """
+    job = session.get(AnalysisJob, job_id)
+    # Jobs submitted by an authenticated user are only visible to that user
+    if not job or (job.user_id and (not current_user or current_user.id != job.user_id)):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        url=job.url,
+        error=job.error,
+        result=AnalyzeResponse(**job.result) if job.status == "completed" and job.result else None,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+@router.post("/analyze/bulk", response_model=BulkSubmitResponse, status_code=202)
+def submit_bulk_analysis(
+    request: BulkAnalyzeRequest,
+    session: Session = Depends(get_session),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional),
+    downloader: DownloaderService = Depends(get_downloader_service),
+    job_runner: AnalysisJobRunner = Depends(get_job_runner)
+):
+    """
+    Queue many videos at once: a list of `urls` and/or a `channel_url` (channel or playlist),
+    expanded with a single flat metadata request. Videos are analyzed by the background workers;
+    the Master Profile is rebuilt once after the last one. Poll GET /analyze/bulk/{batch_id}.
+    """
+    if not request.urls and not request.channel_url:
+        raise HTTPException(status_code=400, detail="Provide `urls` or `channel_url`")
+
+    urls = list(request.urls)
+    if request.channel_url:
+        limit = min(request.limit or settings.BULK_MAX_VIDEOS, settings.BULK_MAX_VIDEOS)
+        try:
+            urls += downloader.expand_urls(request.channel_url, limit=limit)
+        except Exception as e:
+            logger.error(f"Failed to expand {request.channel_url}: {e}")
+            raise HTTPException(status_code=400, detail=f"Failed to expand {request.channel_url}: {str(e)}")
+
+    # The same video under different URLs is analyzed once
+    unique_urls = {}
+    for url in urls:
+        video_key = downloader.resolve_video_key(url)
+        unique_urls.setdefault(video_key or url, url)
+    urls = list(unique_urls.values())
+
+    if not urls:
+        raise HTTPException(status_code=400, detail="No videos found")
+    if len(urls) > settings.BULK_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_VIDEOS} videos per batch")
+
+    logger.info(f"Received bulk analyze request for {len(urls)} videos")
+    try:
+        batch = job_runner.create_batch(
+            urls,
+            session,
+            user_id=current_user.id if current_user else None,
+            force=request.force,
+            source=request.channel_url
+        )
+    except ExecutorOverloaded as e:
+        raise _overloaded(e)
+    return BulkSubmitResponse(batch_id=batch.id, status=batch.status, total=batch.total)
+
+@router.get("/analyze/bulk/{batch_id}", response_model=BulkStatusResponse)
+def get_bulk_analysis(
+    batch_id: str,
+    session: Session = Depends(get_session),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
+):
+    """
+    Progress of a bulk ingest: status of every video job and counts per status.
+    """
+    batch = session.get(AnalysisBatch, batch_id)
+    if not batch or (batch.user_id and (not current_user or current_user.id != batch.user_id)):
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+
+    jobs = session.exec(
+        select(AnalysisJob).where(AnalysisJob.batch_id == batch_id).order_by(AnalysisJob.created_at)
+    ).all()
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+    items = []
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+        items.append(BulkJobItem(
+            job_id=job.id,
+            url=job.url,
+            status=job.status,
+            error=job.error,
+            video_id=(job.result or {}).get("video_id")
+        ))
+
+    return BulkStatusResponse(
+        batch_id=batch.id,
+        status=batch.status,
+        source=batch.source,
+        total=batch.total,
+        counts=counts,
+        jobs=items,
+        created_at=batch.created_at,
+        finished_at=batch.finished_at
+    )
+
 @router.post("/generate", response_model=GenerateResponse)
 def generate_script_endpoint(
     request: GenerateRequest,
@@ -192,11 +403,12 @@ def generate_script_endpoint(
 ):
     """
     Generates a script based on the author's Master Profile (DNA).
+    Repeated topics are answered from cache until the profile changes or `regenerate` is set.
     """
     logger.info(f"Received generate request for user: '{request.username}' topic: '{request.topic}'")
     
     try:
-        script_data = generator.generate_script(request.username, request.topic, session)
+        script_data = generator.generate_script(request.username, request.topic, session, regenerate=request.regenerate)
         
         return GenerateResponse(
             status="success",
@@ -209,36 +421,181 @@ def generate_script_endpoint(
         logger.error(f"Error during generation: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/batch", response_model=GenerateBatchResponse)
+def generate_script_batch_endpoint(
+    request: GenerateBatchRequest,
+    session: Session = Depends(get_session),
+    generator: GeneratorService = Depends(get_generator_service)
+):
+    """
+    Generates scripts for several topics of one author in parallel.
+    Every topic has its own result, a failed topic doesn't fail the others.
+    """
+    logger.info(f"Received batch generate request for user: '{request.username}' ({len(request.topics)} topics)")
+
+    try:
+        results = generator.generate_batch(request.username, request.topics, session, regenerate=request.regenerate)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error during batch generation: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    failed = sum(1 for result in results if result["status"] != "success")
+    return GenerateBatchResponse(
+        status="success" if not failed else ("error" if failed == len(results) else "partial"),
+        results=results
+    )
+
+@router.post("/generate/stream")
+def generate_script_stream_endpoint(
+    request: GenerateRequest,
+    session: Session = Depends(get_session),
+    generator: GeneratorService = Depends(get_generator_service)
+):
+    """
+    Streaming variant of /generate (Server-Sent Events).
+    Events: `title`, `script_item` ({"index", "item"}) for every finished script block,
+    `done` with the full script_data, or `error`.
+    """
+    logger.info(f"Received streaming generate request for user: '{request.username}' topic: '{request.topic}'")
+
+    # Resolved before the stream starts, so a missing profile is still a plain 404
+    try:
+        master_profile = generator.get_master_profile(request.username, session)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    def event_stream():
+        try:
+            for event, data in generator.stream_script(request.username, request.topic, master_profile, regenerate=request.regenerate):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"Error during streaming generation: {str(e)}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Sort orders of video listings: column, newest/highest first, ties broken by id
+VIDEO_SORT_COLUMNS = {
+    "recent": VideoAnalysis.created_at,
+    "views": VideoAnalysis.view_count,
+    "likes": VideoAnalysis.like_count,
+}
+
+def _encode_cursor(sort: str, value: Any, video_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, video_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, video_id = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError("cursor belongs to another sort order")
+        if sort == "recent":
+            value = datetime.fromisoformat(value)
+        return value, int(video_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _list_videos(session: Session, user_id: int, sort: str, limit: int, cursor: Optional[str] = None) -> VideoListResponse:
+    """
+    Keyset pagination over one creator's videos: each page continues after the (sort value, id)
+    of the previous one, so every page costs one index range scan regardless of its position.
+    Only the listed columns are loaded, never the stats / analysis JSON.
+    """
+    sort_column = VIDEO_SORT_COLUMNS[sort]
+    statement = select(
+        VideoAnalysis.id,
+        VideoAnalysis.title,
+        VideoAnalysis.youtube_url,
+        VideoAnalysis.view_count,
+        VideoAnalysis.like_count,
+        VideoAnalysis.platform,
+        VideoAnalysis.created_at,
+        sort_column
+    ).where(VideoAnalysis.user_id == user_id)
+    if cursor:
+        value, video_id = _decode_cursor(cursor, sort)
+        statement = statement.where(or_(
+            sort_column < value,
+            and_(sort_column == value, VideoAnalysis.id < video_id)
+        ))
+    rows = session.exec(
+        statement.order_by(sort_column.desc(), VideoAnalysis.id.desc()).limit(limit + 1)
+    ).all()
+
+    videos = [
+        VideoListItem(
+            id=row[0],
+            title=row[1],
+            url=row[2],
+            views=row[3] or 0,
+            likes=row[4] or 0,
+            platform=row[5] or "Unknown",
+            created_at=row[6]
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(sort, last[7], last[0])
+    return VideoListResponse(videos=videos, next_cursor=next_cursor)
+
+def _profile_response(user: UserProfile, session: Session) -> ProfileResponse:
+    videos_count = session.exec(
+        select(func.count()).select_from(VideoAnalysis).where(VideoAnalysis.user_id == user.id)
+    ).one()
+    first_page = _list_videos(session, user.id, "recent", settings.PROFILE_VIDEOS_PAGE_SIZE)
+    return ProfileResponse(
+        username=user.username,
+        master_profile=user.master_profile,
+        profile_version=user.profile_version or 0,
+        videos_count=videos_count,
+        videos=first_page.videos,
+        next_cursor=first_page.next_cursor
+    )
+
 @router.get("/profile/{username}", response_model=ProfileResponse)
 def get_profile(
     username: str,
     session: Session = Depends(get_session)
 ):
     """
-    Get author's profile, including Master DNA and list of analyzed videos.
+    Get author's profile, including Master DNA, the number of analyzed videos and the newest of them.
+    Older videos are listed with GET /profile/{username}/videos.
     """
     user = session.exec(select(UserProfile).where(UserProfile.username == username)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    videos = []
-    for v in user.videos:
-        videos.append({
-            "id": v.id,
-            "title": v.title,
-            "url": v.youtube_url,
-            "views": v.stats.get("view_count", 0) if v.stats else 0,
-            "likes": v.stats.get("like_count", 0) if v.stats else 0,
-            "platform": v.stats.get("platform", "Unknown") if v.stats else "Unknown",
-            "created_at": v.created_at
-        })
-        
-    return ProfileResponse(
-        username=user.username,
-        master_profile=user.master_profile,
-        videos_count=len(videos),
-        videos=videos
-    )
+
+    return _profile_response(user, session)
+
+@router.get("/profile/{username}/videos", response_model=VideoListResponse)
+def list_profile_videos(
+    username: str,
+    sort: str = Query("recent", pattern="^(recent|views|likes)$"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.PROFILE_VIDEOS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    """
+    Page through the author's analyzed videos, newest (`recent`) or most viewed / liked first.
+    Pass `next_cursor` of a page as `cursor` to get the following one.
+    """
+    user = session.exec(select(UserProfile).where(UserProfile.username == username)).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return _list_videos(session, user.id, sort, limit or settings.PROFILE_VIDEOS_PAGE_SIZE, cursor)
 
 @router.post("/profile/{username}/refresh", response_model=ProfileResponse)
 def refresh_profile(
@@ -255,39 +612,47 @@ def refresh_profile(
         raise HTTPException(status_code=404, detail="User not found")
         
     try:
-        profile_builder.update_master_profile(user.id, session)
+        profile_builder.update_master_profile(user.id, session, full=True)
         session.refresh(user)
     except Exception as e:
         logger.error(f"Error refreshing profile: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to refresh profile: {str(e)}")
-        
-    videos = []
-    for v in user.videos:
-        videos.append({
-            "id": v.id,
-            "title": v.title,
-            "url": v.youtube_url,
-            "views": v.stats.get("view_count", 0) if v.stats else 0,
-            "likes": v.stats.get("like_count", 0) if v.stats else 0,
-            "platform": v.stats.get("platform", "Unknown") if v.stats else "Unknown",
-            "created_at": v.created_at
-        })
-        
-    return ProfileResponse(
-        username=user.username,
-        master_profile=user.master_profile,
-        videos_count=len(videos),
-        videos=videos
-    )
+
+    return _profile_response(user, session)
+
+@router.get("/metrics")
+def get_metrics(
+    session: Session = Depends(get_session),
+    transcriber: TranscriberService = Depends(get_transcriber_service),
+    job_runner: AnalysisJobRunner = Depends(get_job_runner),
+    profile_scheduler: ProfileRebuildScheduler = Depends(get_profile_scheduler),
+    storage: StorageManager = Depends(get_storage_manager)
+):
+    """
+    Runtime load metrics: transcription queue depth/throughput, pending background jobs,
+    executor queues and rejections, profile rebuilds, TEMP_DIR usage and auth cache hit rates.
+    """
+    return {
+        "transcriber": transcriber.stats(),
+        "analysis_jobs": job_runner.stats(),
+        "executors": executor_stats(),
+        "profile_rebuilds": profile_scheduler.stats(),
+        "storage": {
+            "used_bytes": storage.total_bytes(session),
+            "budget_bytes": storage.budget_bytes
+        },
+        "auth_cache": auth_cache_stats()
+    }
 
 @router.get("/video/{video_id}", response_model=VideoResponse)
 def get_video_analysis(
     video_id: int,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_session),
+    transcript_store: TranscriptStore = Depends(get_transcript_store)
 ):
     """
     Get full video analysis by video ID.
-    Returns statistics, transcript (if available), and style analysis.
+    Returns statistics, stored transcript with segments (if available), and style analysis.
     """
     logger.info(f"Received request for video ID: {video_id}")
     
@@ -304,7 +669,8 @@ def get_video_analysis(
         raise HTTPException(status_code=404, detail="User not found for this video")
     
     # Prepare response data
-    # Note: transcript_text is not stored in DB, so we return empty string
+    # Transcript is stored separately; analyses saved before that have none
+    transcript = transcript_store.get(session, video.id) or {"text": "", "segments": []}
     # meta_stats comes from video.stats
     meta_stats = video.stats.copy() if video.stats else {}
     # Ensure title is in meta_stats
@@ -320,7 +686,8 @@ def get_video_analysis(
         status="success",
         video_id=video.id,
         username=user.username,
-        transcript_text="",  # Transcript is not stored in DB
+        transcript_text=transcript["text"],
+        segments=transcript["segments"],
         style_passport=style_passport,
         meta_stats=meta_stats,
         youtube_url=video.youtube_url,
@@ -18,6 +18,118 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 30
+    # Verified tokens and the users they belong to are reused for this many seconds (0 = no cache).
+    # Changes are only seen immediately by the worker process that made them, so this also
+    # bounds how long other workers may keep serving a changed or deleted user.
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "15"))
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+    # Database: SQLite by default, any SQLAlchemy URL (e.g. postgresql+psycopg2://...) otherwise
+    DATABASE_URL: str = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'database.db'}")
+    # Milliseconds a SQLite write waits for a concurrent writer before "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Connection pool of server databases (PostgreSQL)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+    # Background analysis jobs
+    ANALYSIS_WORKERS: int = int(os.getenv("ANALYSIS_WORKERS", "2"))
+    # Most videos a single bulk / channel ingest may queue
+    BULK_MAX_VIDEOS: int = int(os.getenv("BULK_MAX_VIDEOS", "100"))
+    # Queued background jobs beyond which new submissions get 503 + Retry-After
+    JOB_MAX_QUEUE: int = int(os.getenv("JOB_MAX_QUEUE", "500"))
+    # Running jobs are owned by one worker process, which refreshes their heartbeat this often (seconds).
+    # Jobs whose owner hasn't refreshed it for JOB_LEASE_TIMEOUT seconds belong to a dead process and fail.
+    JOB_HEARTBEAT_INTERVAL: float = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+    JOB_LEASE_TIMEOUT: float = float(os.getenv("JOB_LEASE_TIMEOUT", "90"))
+    # Synchronous /analyze requests running at once, and waiting before 503 + Retry-After
+    ANALYZE_CONCURRENCY: int = int(os.getenv("ANALYZE_CONCURRENCY", "2"))
+    ANALYZE_MAX_QUEUE: int = int(os.getenv("ANALYZE_MAX_QUEUE", "4"))
+    # Pipeline stage executors: yt-dlp downloads, ffmpeg, Whisper, Gemini
+    NETWORK_WORKERS: int = int(os.getenv("NETWORK_WORKERS", str(ANALYSIS_WORKERS + ANALYZE_CONCURRENCY)))
+    MEDIA_WORKERS: int = int(os.getenv("MEDIA_WORKERS", str(2 * (ANALYSIS_WORKERS + ANALYZE_CONCURRENCY))))
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", str(ANALYSIS_WORKERS + ANALYZE_CONCURRENCY)))
+    LLM_WORKERS: int = int(os.getenv("LLM_WORKERS", str(ANALYSIS_WORKERS + ANALYZE_CONCURRENCY)))
+
+    # Downloads: "analysis" fetches the smallest streams the pipeline can use, "full" the best mp4 quality
+    DOWNLOAD_PROFILE: str = os.getenv("DOWNLOAD_PROFILE", "analysis")
+    # Smallest acceptable short side of the video in the "analysis" profile
+    DOWNLOAD_MIN_SHORT_SIDE: int = int(os.getenv("DOWNLOAD_MIN_SHORT_SIDE", "512"))
+    # Keep video and audio as separate files instead of merging them ("analysis" profile only)
+    DOWNLOAD_SPLIT_STREAMS: bool = os.getenv("DOWNLOAD_SPLIT_STREAMS", "true").lower() == "true"
+    # Longest a request waits for another worker's download of the same video before failing
+    DOWNLOAD_LEASE_TIMEOUT: float = float(os.getenv("DOWNLOAD_LEASE_TIMEOUT", "600"))
+
+    # Video metadata (title, counts, formats) is reused for this many seconds
+    METADATA_CACHE_TTL: int = int(os.getenv("METADATA_CACHE_TTL", "600"))
+    METADATA_CACHE_SIZE: int = int(os.getenv("METADATA_CACHE_SIZE", "512"))
+
+    # Disk budget for downloads, audio and frames in TEMP_DIR (0 = unlimited).
+    # Least recently used videos are deleted once it is exceeded.
+    STORAGE_BUDGET_MB: int = int(os.getenv("STORAGE_BUDGET_MB", "5120"))
+    # Artifacts used within this many seconds are never evicted (they may belong to a running job)
+    STORAGE_MIN_IDLE_SECONDS: int = int(os.getenv("STORAGE_MIN_IDLE_SECONDS", "1800"))
+
+    # Media extraction:
+    # "keyframes" seeks straight to FRAME_BUDGET points and decodes only keyframes near them,
+    # "combined" decodes the whole video once for audio + a frame every 2 seconds,
+    # "separate" runs two full ffmpeg passes that can overlap on spare cores
+    MEDIA_EXTRACTION_MODE: str = os.getenv("MEDIA_EXTRACTION_MODE", "keyframes")
+    # Stream PCM audio and frames from ffmpeg straight into memory instead of MP3/JPEG temp files.
+    # Set to "false" to keep the files on disk for debugging.
+    MEDIA_IN_MEMORY: bool = os.getenv("MEDIA_IN_MEMORY", "true").lower() == "true"
+    FRAME_BUDGET: int = int(os.getenv("FRAME_BUDGET", "3"))
+    # Keyframes extracted per video in "keyframes" mode; the FRAME_BUDGET most informative are sent
+    FRAME_CANDIDATES: int = int(os.getenv("FRAME_CANDIDATES", "8"))
+    FRAME_MAX_SIZE: int = int(os.getenv("FRAME_MAX_SIZE", "512"))
+    # JPEG quality of the frames attached to the Gemini request
+    FRAME_JPEG_QUALITY: int = int(os.getenv("FRAME_JPEG_QUALITY", "80"))
+    # > 0 picks keyframes by scene-change score instead of evenly spaced timestamps
+    KEYFRAME_SCENE_THRESHOLD: float = float(os.getenv("KEYFRAME_SCENE_THRESHOLD", "0"))
+
+    # Gemini requests, shared by all services of the process (0 = no limit)
+    LLM_RPM: int = int(os.getenv("LLM_RPM", "60"))
+    LLM_TPM: int = int(os.getenv("LLM_TPM", "1000000"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    # Retries of rate-limited / unavailable responses, with exponential backoff between them
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "2"))
+    LLM_BACKOFF_MAX: float = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+    # Generated scripts are reused for the same user, topic and unchanged Master Profile
+    SCRIPT_CACHE_TTL: int = int(os.getenv("SCRIPT_CACHE_TTL", "86400"))
+    SCRIPT_CACHE_SIZE: int = int(os.getenv("SCRIPT_CACHE_SIZE", "1024"))
+
+    # POST /generate/batch: max topics per request and parallel Gemini calls per batch
+    GENERATE_BATCH_MAX_TOPICS: int = int(os.getenv("GENERATE_BATCH_MAX_TOPICS", "20"))
+    GENERATE_BATCH_CONCURRENCY: int = int(os.getenv("GENERATE_BATCH_CONCURRENCY", "4"))
+
+    # Master profile: new videos are merged into the existing profile, with a full
+    # re-synthesis every N updates or when more than PROFILE_INCREMENTAL_MAX_VIDEOS are new
+    PROFILE_FULL_RESYNC_EVERY: int = int(os.getenv("PROFILE_FULL_RESYNC_EVERY", "10"))
+    PROFILE_INCREMENTAL_MAX_VIDEOS: int = int(os.getenv("PROFILE_INCREMENTAL_MAX_VIDEOS", "5"))
+    # Profile updates after an analysis run in the background. Requests for the same user within
+    # the debounce window are coalesced, but a rebuild is never postponed longer than the max delay.
+    PROFILE_REBUILD_DEBOUNCE: float = float(os.getenv("PROFILE_REBUILD_DEBOUNCE", "30"))
+    PROFILE_REBUILD_MAX_DELAY: float = float(os.getenv("PROFILE_REBUILD_MAX_DELAY", "300"))
+    PROFILE_REBUILD_WORKERS: int = int(os.getenv("PROFILE_REBUILD_WORKERS", "1"))
+    # Most recent videos sent to the model on a full re-synthesis
+    PROFILE_FULL_MAX_VIDEOS: int = int(os.getenv("PROFILE_FULL_MAX_VIDEOS", "30"))
+
+    # Videos per page of profile listings (the first page is embedded in GET /profile/{username})
+    PROFILE_VIDEOS_PAGE_SIZE: int = int(os.getenv("PROFILE_VIDEOS_PAGE_SIZE", "20"))
+    PROFILE_VIDEOS_MAX_PAGE_SIZE: int = int(os.getenv("PROFILE_VIDEOS_MAX_PAGE_SIZE", "100"))
+
+    # Whisper transcription
+    WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "small")
+    # Number of transcriptions that can run in parallel on the shared model
+    WHISPER_NUM_WORKERS: int = int(os.getenv("WHISPER_NUM_WORKERS", "2"))
+    # Threads per worker, 0 = split available cores evenly between workers
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+    # > 0 enables batched inference: audio chunks are decoded in parallel batches of this size
+    WHISPER_BATCH_SIZE: int = int(os.getenv("WHISPER_BATCH_SIZE", "0"))
     
     def __init__(self):
         # Ensure temp directories exist
@@ -1,16 +1,102 @@
-from sqlmodel import SQLModel, create_engine, Session
+import logging
+from sqlalchemy import event, inspect, literal, text
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel, create_engine, Session, select
 from app.core.config import settings
+from app.models import VideoAnalysis, engagement_columns
 
-# SQLite DB
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+logger = logging.getLogger(__name__)
 
-engine = create_engine(sqlite_url, echo=False)
+def _create_engine():
+    """
+    SQLite gets WAL journaling (readers don't block the writer), synchronous=NORMAL (safe with WAL,
+    no fsync per commit) and a busy timeout, so concurrent commits wait instead of failing with
+    "database is locked". Server databases get a sized connection pool.
+    """
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            echo=False,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+
+    sqlite_engine = create_engine(
+        url,
+        echo=False,
+        # Sessions are used from worker threads (jobs, profile rebuilds, stage executors)
+        connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if url.database and url.database != ":memory:":
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return sqlite_engine
+
+engine = _create_engine()
+
+def _add_missing_columns():
+    """
+    create_all() only creates missing tables, it never alters existing ones.
+    Add columns (and their indexes) that were introduced after a table was first created.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.default is not None and column.default.is_scalar:
+                    default = literal(column.default.arg).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+                    ddl += f" DEFAULT {default}"
+                connection.execute(text(ddl))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+def _backfill_engagement_columns(batch_size: int = 500) -> int:
+    """
+    Fills the engagement columns of analyses saved before they existed (recognizable by a NULL
+    platform). Works in batches, so memory stays flat on large histories.
+    """
+    filled = 0
+    with Session(engine) as session:
+        while True:
+            videos = session.exec(select(VideoAnalysis).where(VideoAnalysis.platform.is_(None)).limit(batch_size)).all()
+            if not videos:
+                break
+            for video in videos:
+                video.view_count, video.like_count, video.platform = engagement_columns(video.stats)
+                session.add(video)
+            session.commit()
+            filled += len(videos)
+    if filled:
+        logger.info(f"Backfilled engagement columns of {filled} video analyses")
+    return filled
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _backfill_engagement_columns()
 
 def get_session():
     with Session(engine) as session:
         yield session
-
@@ -0,0 +1,188 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ExecutorOverloaded(Exception):
+    """Raised by admission control when an executor's queue is full."""
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Executor '{name}' is overloaded, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class Admission:
+    """
+    Queue slots reserved by BoundedExecutor.admit(). Each submit() uses up one slot;
+    slots that were never used are released by close() (or on leaving the `with` block).
+    """
+    def __init__(self, executor: "BoundedExecutor", count: int):
+        self._executor = executor
+        self._remaining = count
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._executor._lock:
+            if self._remaining <= 0:
+                raise RuntimeError(f"No admitted slots left on executor '{self._executor.name}'")
+            self._remaining -= 1
+        return self._executor._submit(fn, *args, **kwargs)
+
+    def close(self):
+        with self._executor._lock:
+            self._executor._pending -= self._remaining
+            self._remaining = 0
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class BoundedExecutor(Executor):
+    """
+    Thread pool with load accounting and admission control.
+
+    submit() always queues, so work that is already admitted (e.g. the next stage of a running
+    analysis) never fails halfway. Entry points call try_submit() / admit() instead, which reject
+    new work with ExecutorOverloaded once `max_queue` tasks are waiting for a worker.
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # Queued + running
+        self._avg_seconds = None  # Moving average of the task duration
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    def retry_after(self) -> int:
+        """Seconds until a worker is likely to pick up a new task, from the queue length and task durations."""
+        avg_seconds = self._avg_seconds or 1.0
+        return max(1, math.ceil((self.queued / self.max_workers + 1) * avg_seconds))
+
+    def _check(self, count: int):
+        if self.max_queue is not None and self.queued + count > self.max_queue:
+            self.rejected += 1
+            retry_after = self.retry_after()
+            logger.warning(f"Executor {self.name} rejected {count} tasks, {self.queued} queued (retry in {retry_after}s)")
+            raise ExecutorOverloaded(self.name, retry_after)
+
+    def admit(self, count: int = 1) -> Admission:
+        """
+        Reserves `count` queue slots for tasks submitted later through the returned Admission,
+        so concurrent callers can't overshoot `max_queue`. Raises ExecutorOverloaded unless they fit.
+        """
+        with self._lock:
+            self._check(count)
+            self._pending += count
+        return Admission(self, count)
+
+    def try_submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """submit() with admission control."""
+        with self._lock:
+            self._check(1)
+            self._pending += 1
+        return self._submit(fn, *args, **kwargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            self._pending += 1
+        return self._submit(fn, *args, **kwargs)
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        def timed():
+            start_time = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(time.monotonic() - start_time)
+
+        try:
+            future = self._pool.submit(timed)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Also counts tasks cancelled before they started
+        future.add_done_callback(self._done)
+        return future
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self.completed += 1
+            self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_seconds": round(self._avg_seconds, 3) if self._avg_seconds is not None else None
+            }
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+def _executor_config() -> Dict[str, tuple]:
+    """name -> (workers, max queued tasks or None when only admitted work reaches it)"""
+    return {
+        # Synchronous /analyze requests, so they never occupy the server's default threadpool
+        "analyze": (settings.ANALYZE_CONCURRENCY, settings.ANALYZE_MAX_QUEUE),
+        # Pipeline stages, fed by admitted analyses only
+        "default": (settings.ANALYSIS_WORKERS, None),
+        "network": (settings.NETWORK_WORKERS, None),
+        "media": (settings.MEDIA_WORKERS, None),
+        "inference": (settings.INFERENCE_WORKERS, None),
+        "llm": (settings.LLM_WORKERS, None),
+    }
+
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Process-wide executor for one kind of work, created on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            workers, max_queue = _executor_config()[name]
+            executor = BoundedExecutor(name, workers, max_queue)
+            _executors[name] = executor
+        return executor
+
+def get_stage_executors() -> Dict[str, BoundedExecutor]:
+    """Executors the analysis pipeline stages run on, by Stage.executor name."""
+    return {name: get_executor(name) for name in ("default", "network", "media", "inference", "llm")}
+
+def executor_stats() -> dict:
+    with _executors_lock:
+        executors = dict(_executors)
+    return {name: executor.stats() for name, executor in executors.items()}
+
+def shutdown_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,134 @@
+import logging
+import time
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Stage:
+    """
+    A single pipeline step.
+    `func` receives a dict with the graph inputs plus results of all finished stages
+    and returns this stage's result. `executor` is the name of the pool it runs on.
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = ()
+    executor: str = "default"
+
+@dataclass
+class StageGraphRun:
+    results: Dict[str, Any]
+    durations: Dict[str, float]
+    critical_path: List[str]
+    critical_path_seconds: float
+    wall_seconds: float
+
+    def timings(self) -> dict:
+        return {
+            "stages": {name: round(seconds, 3) for name, seconds in self.durations.items()},
+            "critical_path": self.critical_path,
+            "critical_path_seconds": round(self.critical_path_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+        }
+
+class StageGraph:
+    """
+    Runs stages as soon as their dependencies are done, so independent stages
+    (e.g. frame extraction and transcription) overlap on their executors.
+    """
+    def __init__(self, stages: List[Stage], executors: Dict[str, Executor]):
+        self.stages = {stage.name: stage for stage in stages}
+        self.executors = executors
+        self.order = self._topological_order()
+
+        for stage in stages:
+            if stage.executor not in executors:
+                raise ValueError(f"Unknown executor '{stage.executor}' for stage '{stage.name}'")
+
+    def _topological_order(self) -> List[str]:
+        order = []
+        state = {}  # name -> "visiting" | "done"
+
+        def visit(name: str):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Cycle detected in stage graph at '{name}'")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency '{name}'")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _critical_path(self, durations: Dict[str, float]) -> Tuple[List[str], float]:
+        """Longest chain of dependent stages by measured duration."""
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in self.order:
+            upstream = [best[dep] for dep in self.stages[name].deps]
+            total, path = max(upstream, key=lambda item: item[0]) if upstream else (0.0, [])
+            best[name] = (total + durations[name], path + [name])
+
+        total, path = max(best.values(), key=lambda item: item[0])
+        return path, total
+
+    def _run_stage(self, stage: Stage, context: Dict[str, Any]) -> Tuple[Any, float]:
+        start_time = time.time()
+        result = stage.func(context)
+        return result, time.time() - start_time
+
+    def run(self, inputs: Dict[str, Any]) -> StageGraphRun:
+        """Execute the whole graph. The first failing stage's exception is re-raised."""
+        start_time = time.time()
+        context = dict(inputs)
+        durations: Dict[str, float] = {}
+        running: Dict[Future, str] = {}
+        remaining = set(self.order)
+
+        def schedule_ready():
+            for name in self.order:
+                stage = self.stages[name]
+                if name in remaining and all(dep in durations for dep in stage.deps):
+                    remaining.discard(name)
+                    future = self.executors[stage.executor].submit(self._run_stage, stage, dict(context))
+                    running[future] = name
+
+        schedule_ready()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, duration = future.result()
+                except Exception:
+                    for pending in running:
+                        pending.cancel()
+                    logger.error(f"Stage '{name}' failed")
+                    raise
+                context[name] = result
+                durations[name] = duration
+                logger.info(f"Stage '{name}' finished in {duration:.2f}s")
+            schedule_ready()
+
+        critical_path, critical_path_seconds = self._critical_path(durations)
+        wall_seconds = time.time() - start_time
+        logger.info(
+            f"Stage graph finished in {wall_seconds:.2f}s, "
+            f"critical path {' -> '.join(critical_path)} = {critical_path_seconds:.2f}s"
+        )
+
+        return StageGraphRun(
+            results={name: context[name] for name in self.order},
+            durations=durations,
+            critical_path=critical_path,
+            critical_path_seconds=critical_path_seconds,
+            wall_seconds=wall_seconds,
+        )
@@ -1,11 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api.endpoints import router as api_router, get_transcriber_service
+from app.api.endpoints import router as api_router, get_transcriber_service, get_job_runner, get_result_cache_service, get_profile_scheduler
 from app.api.auth import router as auth_router
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.core.db import create_db_and_tables
+from app.core.db import create_db_and_tables, engine
+from app.core.executors import shutdown_executors
+from app.services.download_coordinator import DownloadCoordinator
+from app.services.storage import StorageManager
+from sqlmodel import Session
 import logging
 import sys
 
@@ -44,6 +48,18 @@ async def startup_event():
     create_db_and_tables()
     logger.info("Database initialized.")
 
+    # Drop cached analyses made with an older prompt/model
+    with Session(engine) as session:
+        get_result_cache_service().purge_stale(session)
+
+        # Track files left in TEMP_DIR by earlier runs and trim it to the storage budget
+        storage = StorageManager()
+        storage.adopt_untracked(session)
+        storage.enforce_budget(session)
+
+    # Leases of downloads whose worker process died
+    DownloadCoordinator().cleanup_stale()
+
     logger.info("Pre-loading AI models. This might take a few minutes if downloading for the first time...")
     try:
         # Trigger model loading
@@ -53,6 +69,18 @@ async def startup_event():
         logger.error(f"Failed to load AI models: {e}")
         print(f"CRITICAL ERROR: {e}", file=sys.stderr)
 
+    # Pick up analysis jobs left over from a previous run
+    get_job_runner().resume_pending()
+    # ...and profile updates that were still pending when it stopped
+    get_profile_scheduler().schedule_stale()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    logger.info("Shutting down analysis job runner...")
+    get_job_runner().shutdown()
+    get_profile_scheduler().shutdown()
+    shutdown_executors()
+
 @app.get("/")
 def read_root():
     return {"message": "Video Analysis API is running. Go to /docs for Swagger UI."}
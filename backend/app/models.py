@@ -1,7 +1,8 @@
 from typing import Optional, List, Dict
 from datetime import datetime
+import uuid
 from sqlmodel import Field, SQLModel, Relationship, Column, JSON
-from sqlalchemy import Text
+from sqlalchemy import Text, LargeBinary, Index
 
 class UserProfile(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -9,20 +10,119 @@ class UserProfile(SQLModel, table=True):
     email: Optional[str] = Field(default=None, index=True, unique=True)
     hashed_password: Optional[str] = None
     master_profile: Dict = Field(default={}, sa_column=Column(JSON))
+    # Compact rolling summary of all analyzed videos (totals, best performers), see ProfileBuilderService
+    style_digest: Dict = Field(default={}, sa_column=Column(JSON))
+    # Newest VideoAnalysis already merged into master_profile
+    profile_video_id: Optional[int] = None
+    # Incremental updates since the last full re-synthesis
+    profile_updates: int = 0
+    # Incremented on every master_profile change
+    profile_version: int = 0
     last_updated: datetime = Field(default_factory=datetime.utcnow)
     
     videos: List["VideoAnalysis"] = Relationship(back_populates="user")
 
 class VideoAnalysis(SQLModel, table=True):
+    # Keyset pagination of a creator's videos by each sort order, see GET /profile/{username}/videos
+    __table_args__ = (
+        Index("ix_videoanalysis_user_recent", "user_id", "created_at", "id"),
+        Index("ix_videoanalysis_user_views", "user_id", "view_count", "id"),
+        Index("ix_videoanalysis_user_likes", "user_id", "like_count", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="userprofile.id")
+    user_id: Optional[int] = Field(default=None, foreign_key="userprofile.id", index=True)
     
     youtube_url: str
     title: str
     stats: Dict = Field(default={}, sa_column=Column(JSON))
     analysis_result: Dict = Field(default={}, sa_column=Column(JSON))
+    # Copied out of `stats` on save so listings can sort and page without decoding the JSON
+    view_count: int = 0
+    like_count: int = 0
+    platform: Optional[str] = Field(default=None, index=True)  # NULL only for rows not backfilled yet
+    # Key of the AnalysisResultCache entry this analysis came from
+    analysis_key: Optional[str] = Field(default=None, index=True)
     
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     
     user: Optional[UserProfile] = Relationship(back_populates="videos")
+    # Loaded lazily, profile listings never touch it
+    transcript: Optional["VideoTranscript"] = Relationship(
+        back_populates="video",
+        sa_relationship_kwargs={"uselist": False, "lazy": "select", "cascade": "all, delete-orphan"}
+    )
+
+def engagement_columns(stats: dict) -> tuple:
+    """(view_count, like_count, platform) stored next to the stats JSON of a VideoAnalysis."""
+    stats = stats or {}
+    return (
+        int(stats.get("view_count") or 0),
+        int(stats.get("like_count") or 0),
+        stats.get("platform") or "Unknown"
+    )
+
+class VideoTranscript(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    video_id: int = Field(foreign_key="videoanalysis.id", index=True, unique=True)
+
+    language: Optional[str] = None
+    text: str = Field(default="", sa_column=Column(Text))
+    # zlib-compressed JSON list of {"start", "end", "text"}
+    segments_blob: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+
+    video: Optional[VideoAnalysis] = Relationship(back_populates="transcript")
+
+
+class AnalysisBatch(SQLModel, table=True):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="userprofile.id", index=True)
+
+    source: Optional[str] = None  # Channel / playlist URL the videos were expanded from
+    total: int = 0
+    status: str = Field(default="running", index=True)  # running | completed
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
 
+class AnalysisJob(SQLModel, table=True):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="userprofile.id", index=True)
+    batch_id: Optional[str] = Field(default=None, foreign_key="analysisbatch.id", index=True)
+
+    url: str
+    force: bool = False  # Bypass the analysis result cache
+    status: str = Field(default="queued", index=True)  # queued | running | completed | failed
+    result: Dict = Field(default={}, sa_column=Column(JSON))
+    error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    # Worker process running the job and its last sign of life, see AnalysisJobRunner
+    owner: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class AnalysisResultCache(SQLModel, table=True):
+    # "{platform}:{platform_video_id}:{pipeline_version}"
+    key: str = Field(primary_key=True)
+    platform: str
+    platform_video_id: str
+    pipeline_version: str = Field(index=True)
+
+    transcript: Dict = Field(default={}, sa_column=Column(JSON))  # text, segments, language
+    passport: Dict = Field(default={}, sa_column=Column(JSON))
+    stats: Dict = Field(default={}, sa_column=Column(JSON))
+    paths: Dict = Field(default={}, sa_column=Column(JSON))
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class StoredArtifact(SQLModel, table=True):
+    # Path relative to TEMP_DIR: a downloaded file, extracted audio or a frames directory
+    path: str = Field(primary_key=True)
+    video_id: str = Field(index=True)
+    kind: str  # video | audio | frames
+    size_bytes: int = 0
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_access: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,371 @@
+import logging
+import os
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.executors import get_stage_executors
+from app.core.stage_graph import Stage, StageGraph, StageGraphRun
+from app.models import AnalysisResultCache
+
+from app.services.downloader import DownloaderService
+from app.services.video_processing import VideoProcessingService
+from app.services.transcriber import TranscriberService
+from app.services.analyzer import AnalyzerService
+from app.services.profile_scheduler import ProfileRebuildScheduler
+from app.services.result_cache import AnalysisResultCacheService
+from app.services.transcript_store import TranscriptStore
+from app.services.storage import StorageManager
+
+logger = logging.getLogger(__name__)
+
+class AnalysisPipeline:
+    """
+    Full analysis flow for a single video URL.
+    Shared by the synchronous /analyze endpoint and the background job runner.
+    """
+    def __init__(
+        self,
+        downloader: DownloaderService,
+        video_processor: VideoProcessingService,
+        transcriber: TranscriberService,
+        analyzer: AnalyzerService,
+        profile_scheduler: ProfileRebuildScheduler,
+        result_cache: AnalysisResultCacheService,
+        transcript_store: TranscriptStore,
+        storage: StorageManager
+    ):
+        self.downloader = downloader
+        self.video_processor = video_processor
+        self.transcriber = transcriber
+        self.analyzer = analyzer
+        self.profile_scheduler = profile_scheduler
+        self.result_cache = result_cache
+        self.transcript_store = transcript_store
+        self.storage = storage
+
+    def _stages(self) -> List[Stage]:
+        """
+        Dependency graph of the analysis steps:
+        download -> audio -> transcribe -> analyze, with frame extraction running
+        alongside audio extraction and transcription. In "combined" extraction mode
+        audio and frames come out of a single ffmpeg pass instead; in "keyframes" mode
+        only the frames the analyzer needs are decoded. With MEDIA_IN_MEMORY the audio
+        and frames are streamed into memory and no temp files are written.
+        """
+        if settings.MEDIA_IN_MEMORY and settings.MEDIA_EXTRACTION_MODE == "combined":
+            extraction = [
+                Stage("media", self._load_media, deps=("download",), executor="media"),
+                Stage("audio", lambda ctx: ctx["media"][0], deps=("media",)),
+                Stage("frames", lambda ctx: ctx["media"][1], deps=("media",)),
+            ]
+        elif settings.MEDIA_IN_MEMORY:
+            extraction = [
+                Stage("audio", self._load_audio, deps=("download",), executor="media"),
+                Stage("frames", self._load_frames, deps=("download",), executor="media"),
+            ]
+        elif settings.MEDIA_EXTRACTION_MODE == "combined":
+            extraction = [
+                Stage("media", self._extract_media, deps=("download",), executor="media"),
+                Stage("audio", lambda ctx: ctx["media"][0], deps=("media",)),
+                Stage("frames", lambda ctx: ctx["media"][1], deps=("media",)),
+            ]
+        elif settings.MEDIA_EXTRACTION_MODE == "keyframes":
+            extraction = [
+                Stage("audio", self._extract_audio, deps=("download",), executor="media"),
+                Stage("frames", self._extract_keyframes, deps=("download",), executor="media"),
+            ]
+        else:
+            extraction = [
+                Stage("audio", self._extract_audio, deps=("download",), executor="media"),
+                Stage("frames", self._extract_frames, deps=("download",), executor="media"),
+            ]
+
+        return [
+            Stage("download", self._download, executor="network"),
+            Stage("stats", self._collect_stats, deps=("download",)),
+            *extraction,
+            Stage("prepare_frames", self._prepare_frames, deps=("frames",), executor="media"),
+            Stage("transcribe", self._transcribe, deps=("audio",), executor="inference"),
+            Stage("analyze", self._analyze, deps=("stats", "prepare_frames", "transcribe"), executor="llm"),
+        ]
+
+    def _download(self, ctx: dict) -> dict:
+        logger.info("Step 1/5: Downloading video...")
+        download_result = self.downloader.download(ctx["url"])
+        video_id = download_result["video_id"]
+        # Keep the files from being evicted until the whole run is finished
+        ctx["pins"].enter_context(self.storage.pin(video_id))
+        self.storage.register(ctx["session"], video_id, download_result["video_path"], "video")
+        if download_result.get("audio_path") != download_result["video_path"]:
+            self.storage.register(ctx["session"], video_id, download_result.get("audio_path"), "audio")
+        return download_result
+
+    def _collect_stats(self, ctx: dict) -> dict:
+        download_result = ctx["download"]
+        return {
+            "view_count": download_result.get("view_count", 0),
+            "like_count": download_result.get("like_count", 0),
+            "comment_count": download_result.get("comment_count", 0),
+            "uploader": download_result.get("uploader", "Unknown"),
+            "title": download_result.get("title", "Unknown"),
+            "duration": download_result.get("duration", 0),
+            "platform": download_result.get("platform", "Unknown")  # Add platform to stats
+        }
+
+    def _extract_media(self, ctx: dict) -> Tuple[Path, Path]:
+        logger.info("Step 2/5: Extracting audio and frames...")
+        return self.video_processor.extract_media(
+            ctx["download"]["video_path"],
+            ctx["download"]["video_id"],
+            audio_source=ctx["download"].get("audio_path")
+        )
+
+    def _extract_audio(self, ctx: dict) -> Path:
+        logger.info("Step 2/5: Extracting audio...")
+        audio_source = ctx["download"].get("audio_path") or ctx["download"]["video_path"]
+        return self.video_processor.extract_audio(audio_source, ctx["download"]["video_id"])
+
+    def _extract_frames(self, ctx: dict) -> Path:
+        logger.info("Step 2/5: Extracting frames...")
+        return self.video_processor.extract_frames(ctx["download"]["video_path"], ctx["download"]["video_id"])
+
+    def _extract_keyframes(self, ctx: dict) -> Path:
+        logger.info("Step 2/5: Extracting keyframes...")
+        return self.video_processor.extract_keyframes(
+            ctx["download"]["video_path"],
+            ctx["download"]["video_id"],
+            max_frames=max(settings.FRAME_CANDIDATES, settings.FRAME_BUDGET),
+            duration=ctx["download"].get("duration"),
+            scene_threshold=settings.KEYFRAME_SCENE_THRESHOLD,
+            max_size=settings.FRAME_MAX_SIZE
+        )
+
+    def _load_media(self, ctx: dict) -> Tuple[np.ndarray, List[Image.Image]]:
+        logger.info("Step 2/5: Streaming audio and frames in memory...")
+        return self.video_processor.load_media(
+            ctx["download"]["video_path"],
+            max_size=settings.FRAME_MAX_SIZE,
+            audio_source=ctx["download"].get("audio_path")
+        )
+
+    def _load_audio(self, ctx: dict) -> np.ndarray:
+        logger.info("Step 2/5: Decoding audio in memory...")
+        return self.video_processor.load_audio_pcm(ctx["download"].get("audio_path") or ctx["download"]["video_path"])
+
+    def _load_frames(self, ctx: dict) -> List[Image.Image]:
+        logger.info("Step 2/5: Streaming frames in memory...")
+        if settings.MEDIA_EXTRACTION_MODE == "keyframes":
+            return self.video_processor.load_keyframes(
+                ctx["download"]["video_path"],
+                max_frames=max(settings.FRAME_CANDIDATES, settings.FRAME_BUDGET),
+                duration=ctx["download"].get("duration"),
+                scene_threshold=settings.KEYFRAME_SCENE_THRESHOLD,
+                max_size=settings.FRAME_MAX_SIZE
+            )
+        return self.video_processor.load_frames(ctx["download"]["video_path"], max_size=settings.FRAME_MAX_SIZE)
+
+    def _prepare_frames(self, ctx: dict) -> List[bytes]:
+        """Frames encoded for the Gemini request; overlaps with transcription."""
+        frames = ctx["frames"]
+        if isinstance(frames, Path):
+            return self.analyzer.prepare_frames(frames_dir=frames)
+        return self.analyzer.prepare_frames(frame_images=frames)
+
+    def _transcribe(self, ctx: dict) -> dict:
+        logger.info("Step 3/5: Transcribing...")
+        return self.transcriber.transcribe(ctx["audio"])
+
+    def _analyze(self, ctx: dict) -> dict:
+        logger.info("Step 4/5: Analyzing style & saving...")
+        return self.analyzer.analyze_video_style(
+            transcript_text=ctx["transcribe"]["text"],
+            frames_dir=None,
+            frame_payloads=ctx["prepare_frames"],
+            stats=ctx["stats"],
+            video_url=ctx["url"],
+            session=ctx["session"],
+            current_user_id=ctx["current_user_id"],
+            analysis_key=self._analysis_key(ctx["download"])
+        )
+
+    def _analysis_key(self, download_result: dict) -> Optional[str]:
+        if not download_result.get("extractor_key"):
+            return None
+        return self.result_cache.make_key(download_result["extractor_key"], download_result["video_id"])
+
+    @staticmethod
+    def _existing_paths(paths: dict) -> dict:
+        """Cached artifact paths, blanked where the file was evicted or cleaned up since."""
+        return {name: path if path and os.path.exists(path) else "" for name, path in (paths or {}).items()}
+
+    def _from_cache(
+        self,
+        entry: AnalysisResultCache,
+        url: str,
+        session: Session,
+        current_user_id: Optional[int],
+        start_time: float,
+        update_profile: bool
+    ) -> dict:
+        """Builds the response from a cached analysis; only the DB link to the user is written."""
+        analysis_result = self.analyzer.save_analysis(
+            entry.passport, entry.stats, url, session, current_user_id, analysis_key=entry.key
+        )
+        if analysis_result["created"]:
+            self.transcript_store.save(
+                session,
+                analysis_result["video_id"],
+                entry.transcript.get("text", ""),
+                entry.transcript.get("segments", []),
+                entry.transcript.get("language")
+            )
+            if update_profile:
+                self.profile_scheduler.schedule(analysis_result["user_id"])
+
+        logger.info(f"Analysis served from cache in {time.time() - start_time:.3f}s")
+
+        return {
+            "status": "success",
+            "video_id": analysis_result["video_id"],
+            "username": analysis_result["username"],
+            "transcript_text": entry.transcript.get("text", ""),
+            "segments": entry.transcript.get("segments", []),
+            "paths": self._existing_paths(entry.paths),
+            "style_passport": entry.passport,
+            "meta_stats": entry.stats,
+            "timings": {"cache_hit": True, "wall_seconds": round(time.time() - start_time, 3)}
+        }
+
+    def run_cached(
+        self,
+        url: str,
+        session: Session,
+        current_user_id: Optional[int] = None,
+        update_profile: bool = True
+    ) -> Optional[dict]:
+        """
+        The response for an already analyzed video, None on a cache miss.
+        Needs no network request, so callers can try it before queueing a full run.
+        """
+        start_time = time.time()
+        video_key = self.downloader.resolve_video_key(url)
+        if not video_key:
+            return None
+        entry = self.result_cache.get(session, *video_key)
+        if not entry:
+            return None
+        return self._from_cache(entry, url, session, current_user_id, start_time, update_profile)
+
+    def run(
+        self,
+        url: str,
+        session: Session,
+        current_user_id: Optional[int] = None,
+        force: bool = False,
+        update_profile: bool = True
+    ) -> dict:
+        """
+        Download -> Extract -> Transcribe -> AI Analyze -> Save to DB -> Schedule Profile Update.
+        Videos already analyzed with the current pipeline version are served from the result cache
+        unless `force` is set. Bulk ingests pass `update_profile=False` and rebuild the profile once at the end.
+        Returns a dict matching the AnalyzeResponse schema.
+        """
+        if not force:
+            cached = self.run_cached(url, session, current_user_id, update_profile)
+            if cached:
+                return cached
+
+        with ExitStack() as pins:
+            graph = StageGraph(self._stages(), get_stage_executors())
+            run = graph.run({"url": url, "session": session, "current_user_id": current_user_id, "pins": pins})
+            return self._finish(run, session, update_profile)
+
+    def _finish(self, run: StageGraphRun, session: Session, update_profile: bool) -> dict:
+        """Validates the graph results, stores them and builds the response."""
+        download_result = run.results["download"]
+        video_stats = run.results["stats"]
+        audio_path = run.results["audio"]
+        frames_dir = run.results["frames"]
+        transcript_result = run.results["transcribe"]
+        analysis_result = run.results["analyze"]
+
+        # Check if analysis failed
+        if "error" in analysis_result:
+            error_msg = analysis_result.get("error", "Unknown error during analysis")
+            logger.error(f"Analysis failed: {error_msg}")
+            raise Exception(f"Video analysis failed: {error_msg}")
+
+        db_video_id = analysis_result.get("video_id")
+        db_user_id = analysis_result.get("user_id")
+        username = analysis_result.get("username")
+        style_passport = analysis_result.get("passport")
+
+        # Validate that we have required fields
+        if not db_video_id or not username:
+            error_msg = analysis_result.get("error", "Analysis completed but missing required fields")
+            logger.error(f"Analysis incomplete: video_id={db_video_id}, username={username}")
+            raise Exception(f"Video analysis incomplete: {error_msg}")
+
+        self.transcript_store.save(
+            session,
+            db_video_id,
+            transcript_result["text"],
+            transcript_result["segments"],
+            transcript_result.get("language")
+        )
+
+        # 5. Update Master Profile in the background, the response doesn't wait for it
+        logger.info("Step 5/5: Scheduling Master Profile update...")
+        if db_user_id and update_profile:
+            self.profile_scheduler.schedule(db_user_id)
+
+        # Audio and frames have no paths when they were only held in memory
+        paths = {
+            "video": str(download_result["video_path"]),
+            "audio": str(audio_path) if isinstance(audio_path, Path) else "",
+            "frames": str(frames_dir) if isinstance(frames_dir, Path) else ""
+        }
+        if download_result.get("extractor_key"):
+            self.result_cache.put(
+                session,
+                download_result["extractor_key"],
+                download_result["video_id"],
+                transcript={
+                    "text": transcript_result["text"],
+                    "segments": transcript_result["segments"],
+                    "language": transcript_result.get("language")
+                },
+                passport=style_passport,
+                stats=video_stats,
+                paths=paths
+            )
+
+        video_id = download_result["video_id"]
+        if isinstance(audio_path, Path):
+            self.storage.register(session, video_id, audio_path, "audio")
+        if isinstance(frames_dir, Path):
+            self.storage.register(session, video_id, frames_dir, "frames")
+        try:
+            self.storage.enforce_budget(session)
+        except Exception as e:
+            logger.warning(f"Storage eviction failed: {e}")
+
+        logger.info(f"Analysis flow completed successfully. Timings: {run.timings()}")
+
+        return {
+            "status": "success",
+            "video_id": db_video_id,
+            "username": username,
+            "transcript_text": transcript_result["text"],
+            "segments": transcript_result["segments"],
+            "paths": paths,
+            "style_passport": style_passport,
+            "meta_stats": video_stats,
+            "timings": {**run.timings(), "cache_hit": False}
+        }
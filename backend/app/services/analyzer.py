@@ -1,73 +1,157 @@
-import google.generativeai as genai
 from PIL import Image
 from pathlib import Path
-import os
+from typing import List, Optional, Union
+import io
 import logging
-import json
 import time
+import hashlib
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from app.core.config import settings
-from app.models import UserProfile, VideoAnalysis
+from app.models import UserProfile, VideoAnalysis, engagement_columns
+from app.services.llm_client import LLMClient, parse_json_response
+from app.services.frame_selector import FrameSelectorService
 
 logger = logging.getLogger(__name__)
 
+ANALYZER_MODEL_NAME = 'models/gemini-2.5-flash'
+
+# Filled with .format(stats_context=...); literal braces of the JSON example are doubled
+STYLE_PASSPORT_PROMPT = """
+        КРИТИЧЕСКИ ВАЖНО: Ты анализируешь и генерируешь контент для русскоязычной аудитории.
+        ВЕСЬ выходной текст (описания, анализ стиля, советы) должен быть СТРОГО на РУССКОМ языке.
+        
+        Правило JSON: Сохраняй ключи JSON на английском (например, 'hook_analysis', 'visual_style', 'pacing_wpm'), 
+        но ВСЕ значения пиши на русском языке.
+        
+        Пример правильного формата:
+        {{
+            "hook_analysis": "Яркий визуальный ряд с крупным планом лица, агрессивная музыка",
+            "visual_style": "Быстрая смена кадров, насыщенные цвета, динамичные переходы",
+            "audio_tone": "Энергичный и саркастичный"
+        }}
+        
+        You are a professional video editor and viral content marketer.
+        Analyze the provided video frames and audio transcription to create a "Style Passport".
+        
+        {stats_context}
+        
+        Output MUST be valid JSON with this exact structure (ключи на английском, значения на русском):
+        {{
+            "hook_analysis": "String на русском. Анализ первых 5 секунд. Почему это цепляет внимание? (Визуал/Аудио)",
+            "pacing_wpm": Number. Оценка темпа речи (1-10, где 10 - очень быстро)",
+            "visual_style": "String на русском. Описание цветокоррекции, ракурсов камеры, динамики кадров.",
+            "audio_tone": "String на русском. Описание тона голоса (энергичный, спокойный, саркастичный и т.д.).",
+            "structure": [
+                {{"time": "String (например, 00:00-00:05)", "block": "Hook/Body/CTA", "description": "String на русском"}}
+            ],
+            "virality_score": Number (1-10). Насколько вероятно, что это видео станет вирусным на Shorts/Reels?",
+            "key_elements": ["String на русском", "String на русском"] (Список конкретных приемов монтажа, например: 'зумы', 'субтитры', 'b-roll'),
+            "stats_analysis": "String на русском. Краткий комментарий о том, как стиль коррелирует с количеством просмотров."
+        }}
+        """
+
+# Bump when the analysis flow changes in a way the prompt/model/settings fingerprint doesn't capture.
+# 2: keyframe extraction, draft-mode JPEG encoding and scene/pHash frame selection
+PIPELINE_REVISION = "2"
+
+def analysis_pipeline_version() -> str:
+    """
+    Short fingerprint of everything that shapes a Style Passport, including the settings
+    that decide which frames reach Gemini and how they are encoded.
+    Cached analysis results from another version are never reused.
+    """
+    frame_settings = (
+        f"{settings.MEDIA_EXTRACTION_MODE}|{settings.FRAME_BUDGET}|{settings.FRAME_CANDIDATES}|"
+        f"{settings.FRAME_MAX_SIZE}|{settings.FRAME_JPEG_QUALITY}|{settings.KEYFRAME_SCENE_THRESHOLD}"
+    )
+    fingerprint = f"{PIPELINE_REVISION}|{ANALYZER_MODEL_NAME}|{settings.WHISPER_MODEL_SIZE}|{frame_settings}|{STYLE_PASSPORT_PROMPT}"
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+def encode_frame(frame: Union[Path, Image.Image], max_size: int, quality: int) -> bytes:
+    """
+    Frame -> JPEG bytes fitting `max_size`, ready to be attached to a Gemini request.
+    JPEGs that aren't decoded yet are opened in draft mode, so libjpeg scales them down by
+    1/2, 1/4 or 1/8 during the DCT instead of decoding every pixel at full resolution.
+    """
+    if isinstance(frame, Path):
+        # Closed right after encoding, so frame files don't hold file descriptors until GC
+        with Image.open(frame) as image:
+            return _encode_image(image, max_size, quality, owned=True)
+    return _encode_image(frame, max_size, quality, owned=False)
+
+def _encode_image(image: Image.Image, max_size: int, quality: int, owned: bool) -> bytes:
+    """`owned` images may be resized in place, the caller's in-memory frames are copied first."""
+    if image.format == "JPEG":
+        image.draft("RGB", (max_size, max_size))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+        owned = True
+    if max(image.size) > max_size:
+        image = image if owned else image.copy()
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
 class AnalyzerService:
     def __init__(self):
+        self.frame_selector = FrameSelectorService()
         api_key = settings.GOOGLE_API_KEY
         if not api_key:
             logger.warning("GOOGLE_API_KEY is not set. AnalyzerService will fail if called.")
         else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(
-                'models/gemini-2.5-flash',
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            self.llm = LLMClient(ANALYZER_MODEL_NAME)
             logger.info("Gemini client initialized for vision analysis")
 
-    def analyze_video_style(self, transcript_text: str, frames_dir: Path, stats: dict, video_url: str, session: Session, current_user_id: int = None) -> dict:
+    def prepare_frames(self, frames_dir: Optional[Path] = None, frame_images: Optional[List[Image.Image]] = None) -> List[bytes]:
         """
-        Analyzes video style using Gemini Vision API, saves result to DB, and triggers profile update.
+        Selects the frames sent to Gemini and encodes each of them once as a compact JPEG.
+        Frames are read from `frames_dir`, or taken from `frame_images` when they were streamed in memory.
         """
-        if not settings.GOOGLE_API_KEY:
-             raise ValueError("GOOGLE_API_KEY is missing in environment variables.")
-
-        logger.info("Starting video style analysis with Gemini Vision...")
-        
-        # 1. Prepare Images (Optimized: max 3 frames)
-        image_files = sorted(list(frames_dir.glob("*.jpg")))
+        # Frames come either as files in frames_dir or as images streamed from ffmpeg
+        image_files = frame_images if frame_images is not None else sorted(list(frames_dir.glob("*.jpg")))
         if not image_files:
-            raise FileNotFoundError(f"No frames found in {frames_dir}")
-
-        # Select 3 frames: beginning, middle, end
-        max_frames = 3
-        if len(image_files) >= 3:
-            # Take first, middle, last
-            selected_indices = [0, len(image_files) // 2, len(image_files) - 1]
-            selected_frames_paths = [image_files[i] for i in selected_indices]
-        else:
-            selected_frames_paths = image_files
+            raise FileNotFoundError(f"No frames found in {frames_dir or 'memory'}")
+
+        # The FRAME_BUDGET most informative frames: scene changes, detail, no near-duplicates
+        selected_indices = self.frame_selector.select(image_files, settings.FRAME_BUDGET)
+        selected_frames_paths = [image_files[i] for i in selected_indices]
         
         logger.info(f"Selected {len(selected_frames_paths)} frames for analysis (from {len(image_files)} total frames).")
 
-        processed_images = []
+        start_time = time.time()
+        payloads = []
         for img_path in selected_frames_paths:
             try:
-                # Use thumbnail for efficient compression to 512x512 max
-                img = Image.open(img_path)
-                # Convert to RGB if needed (removes alpha channel, optimizes format)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                img.thumbnail((512, 512), Image.Resampling.LANCZOS)
-                processed_images.append(img)
+                payloads.append(encode_frame(img_path, settings.FRAME_MAX_SIZE, settings.FRAME_JPEG_QUALITY))
             except Exception as e:
                 logger.warning(f"Failed to process image {img_path}: {e}")
         
-        if not processed_images:
+        if not payloads:
             raise ValueError("No images were successfully processed")
         
-        logger.info(f"Processed {len(processed_images)} images (all converted to RGB, max 512x512)")
+        logger.info(
+            f"Encoded {len(payloads)} frames in {time.time() - start_time:.3f}s "
+            f"({sum(len(p) for p in payloads) // 1024} KB, max {settings.FRAME_MAX_SIZE}px, quality {settings.FRAME_JPEG_QUALITY})"
+        )
+        return payloads
+
+    def analyze_video_style(self, transcript_text: str, frames_dir: Optional[Path], stats: dict, video_url: str, session: Session, current_user_id: int = None, analysis_key: str = None, frame_images: Optional[List[Image.Image]] = None, frame_payloads: Optional[List[bytes]] = None) -> dict:
+        """
+        Analyzes video style using Gemini Vision API, saves result to DB, and triggers profile update.
+        `frame_payloads` are frames already encoded by prepare_frames(); without them the frames
+        are prepared here from `frames_dir` / `frame_images`.
+        """
+        if not settings.GOOGLE_API_KEY:
+             raise ValueError("GOOGLE_API_KEY is missing in environment variables.")
+
+        logger.info("Starting video style analysis with Gemini Vision...")
+        
+        # 1. Prepare Images (at most FRAME_BUDGET frames)
+        if frame_payloads is None:
+            frame_payloads = self.prepare_frames(frames_dir, frame_images)
 
         # 2. Context from Stats
         stats_context = ""
@@ -84,39 +168,7 @@ class AnalyzerService:
             """
 
         # 3. Prompt
-        system_instruction = f"""
-        КРИТИЧЕСКИ ВАЖНО: Ты анализируешь и генерируешь контент для русскоязычной аудитории.
-        ВЕСЬ выходной текст (описания, анализ стиля, советы) должен быть СТРОГО на РУССКОМ языке.
-        
-        Правило JSON: Сохраняй ключи JSON на английском (например, 'hook_analysis', 'visual_style', 'pacing_wpm'), 
-        но ВСЕ значения пиши на русском языке.
-        
-        Пример правильного формата:
-        {{
-            "hook_analysis": "Яркий визуальный ряд с крупным планом лица, агрессивная музыка",
-            "visual_style": "Быстрая смена кадров, насыщенные цвета, динамичные переходы",
-            "audio_tone": "Энергичный и саркастичный"
-        }}
-        
-        You are a professional video editor and viral content marketer.
-        Analyze the provided video frames and audio transcription to create a "Style Passport".
-        
-        {stats_context}
-        
-        Output MUST be valid JSON with this exact structure (ключи на английском, значения на русском):
-        {{
-            "hook_analysis": "String на русском. Анализ первых 5 секунд. Почему это цепляет внимание? (Визуал/Аудио)",
-            "pacing_wpm": Number. Оценка темпа речи (1-10, где 10 - очень быстро)",
-            "visual_style": "String на русском. Описание цветокоррекции, ракурсов камеры, динамики кадров.",
-            "audio_tone": "String на русском. Описание тона голоса (энергичный, спокойный, саркастичный и т.д.).",
-            "structure": [
-                {{"time": "String (например, 00:00-00:05)", "block": "Hook/Body/CTA", "description": "String на русском"}}
-            ],
-            "virality_score": Number (1-10). Насколько вероятно, что это видео станет вирусным на Shorts/Reels?",
-            "key_elements": ["String на русском", "String на русском"] (Список конкретных приемов монтажа, например: 'зумы', 'субтитры', 'b-roll'),
-            "stats_analysis": "String на русском. Краткий комментарий о том, как стиль коррелирует с количеством просмотров."
-        }}
-        """
+        system_instruction = STYLE_PASSPORT_PROMPT.format(stats_context=stats_context)
 
         # Limit transcript length to avoid exceeding token limits (max ~2000 chars)
         max_transcript_length = 2000
@@ -125,90 +177,111 @@ class AnalyzerService:
             logger.warning(f"Transcript truncated from {len(transcript_text)} to {len(truncated_text)} characters")
             transcript_text = truncated_text
         
-        # Estimate data size for logging
+        # Request size for logging
         prompt_text_size = len(system_instruction) + len(transcript_text)
-        logger.info(f"Sending request: {len(processed_images)} images, ~{prompt_text_size} chars text")
+        image_bytes = sum(len(payload) for payload in frame_payloads)
+        logger.info(f"Sending request: {len(frame_payloads)} images ({image_bytes} bytes), ~{prompt_text_size} chars text")
         
         prompt = [
             system_instruction,
             f"TRANSCRIPT:\n{transcript_text}\n\nVISUALS (Attached Frames):",
-            *processed_images
+            *({"mime_type": "image/jpeg", "data": payload} for payload in frame_payloads)
         ]
 
-        # 4. Call API with retry logic for 429 errors
-        max_attempts = 2  # Initial + 1 retry
-        for attempt in range(max_attempts):
-            try:
-                start_time = time.time()
-                response = self.model.generate_content(prompt)
-                duration = time.time() - start_time
-                logger.info(f"Gemini analysis completed in {duration:.2f}s")
-                
-                response_text = response.text.strip()
-                # Cleanup markdown
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                
-                result_json = json.loads(response_text)
-                
-                # 5. Save to DB
-                uploader_name = stats.get("uploader", "Unknown Author")
-                
-                # Use current authenticated user if provided, otherwise fallback to uploader_name
-                if current_user_id:
-                    user = session.get(UserProfile, current_user_id)
-                    if not user:
-                        logger.warning(f"Current user {current_user_id} not found, falling back to uploader_name")
-                        current_user_id = None
-                
-                if not current_user_id:
-                    # Fallback: Find or create user by uploader_name (for backward compatibility)
-                    statement = select(UserProfile).where(UserProfile.username == uploader_name)
-                    results = session.exec(statement)
-                    user = results.first()
-                    
-                    if not user:
-                        logger.info(f"Creating new user profile for: {uploader_name}")
-                        user = UserProfile(username=uploader_name)
-                        session.add(user)
-                        session.commit()
-                        session.refresh(user)
-                
-                # Save video analysis
-                video = VideoAnalysis(
-                    user_id=user.id,
-                    youtube_url=video_url,
-                    title=stats.get("title", "Unknown"),
-                    stats=stats,
-                    analysis_result=result_json
-                )
-                session.add(video)
+        # 4. Call API (rate limiting and retries are handled by the shared client)
+        try:
+            start_time = time.time()
+            response = self.llm.generate(prompt)
+            duration = time.time() - start_time
+            logger.info(f"Gemini analysis completed in {duration:.2f}s")
+            
+            result_json = parse_json_response(response.text)
+            
+            # 5. Save to DB
+            return self.save_analysis(result_json, stats, video_url, session, current_user_id, analysis_key)
+            
+        except Exception as e:
+            logger.error(f"Gemini API Error: {e}")
+            return {
+                "error": str(e),
+                "passport": {"error": "Analysis failed"}
+            }
+
+    def save_analysis(self, passport: dict, stats: dict, video_url: str, session: Session, current_user_id: int = None, analysis_key: str = None) -> dict:
+        """
+        Saves a Style Passport to DB for the current user (or the uploader's profile).
+        If `analysis_key` is given and this user already has an analysis with the same key,
+        that row is updated instead of creating a duplicate ("created" is False).
+        """
+        uploader_name = stats.get("uploader", "Unknown Author")
+        
+        # Use current authenticated user if provided, otherwise fallback to uploader_name
+        if current_user_id:
+            user = session.get(UserProfile, current_user_id)
+            if not user:
+                logger.warning(f"Current user {current_user_id} not found, falling back to uploader_name")
+                current_user_id = None
+        
+        if not current_user_id:
+            # Fallback: Find or create user by uploader_name (for backward compatibility)
+            statement = select(UserProfile).where(UserProfile.username == uploader_name)
+            results = session.exec(statement)
+            user = results.first()
+            
+            if not user:
+                logger.info(f"Creating new user profile for: {uploader_name}")
+                try:
+                    user = UserProfile(username=uploader_name)
+                    session.add(user)
+                    session.commit()
+                    session.refresh(user)
+                except IntegrityError:
+                    # Another job of the same creator (e.g. a bulk ingest) created it first
+                    session.rollback()
+                    user = session.exec(statement).one()
+        
+        if analysis_key:
+            existing = session.exec(
+                select(VideoAnalysis)
+                .where(VideoAnalysis.user_id == user.id, VideoAnalysis.analysis_key == analysis_key)
+            ).first()
+            if existing:
+                existing.title = stats.get("title", existing.title)
+                existing.stats = stats
+                existing.view_count, existing.like_count, existing.platform = engagement_columns(stats)
+                existing.analysis_result = passport
+                session.add(existing)
                 session.commit()
-                session.refresh(video)
-                
-                logger.info(f"Saved video analysis to DB (ID: {video.id})")
-                
-                # Return combined result
+                logger.info(f"Updated existing video analysis for {user.username} (ID: {existing.id})")
                 return {
-                    "passport": result_json,
-                    "video_id": video.id,
+                    "passport": passport,
+                    "video_id": existing.id,
                     "user_id": user.id,
-                    "username": user.username
+                    "username": user.username,
+                    "created": False
                 }
-                
-            except Exception as e:
-                error_str = str(e)
-                is_rate_limit = "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower()
-                
-                if is_rate_limit and attempt < max_attempts - 1:
-                    logger.warning(f"Gemini API 429 error (attempt {attempt + 1}/{max_attempts}). Retrying in 10s...")
-                    time.sleep(10)
-                    continue
-                else:
-                    logger.error(f"Gemini API Error: {e}")
-                    return {
-                        "error": str(e),
-                        "passport": {"error": "Analysis failed"}
-                    }
+        
+        # Save video analysis
+        video = VideoAnalysis(
+            user_id=user.id,
+            youtube_url=video_url,
+            title=stats.get("title", "Unknown"),
+            stats=stats,
+            analysis_result=passport,
+            analysis_key=analysis_key
+        )
+        video.view_count, video.like_count, video.platform = engagement_columns(stats)
+        session.add(video)
+        session.commit()
+        session.refresh(video)
+        
+        logger.info(f"Saved video analysis to DB (ID: {video.id})")
+        
+        # Return combined result
+        return {
+            "passport": passport,
+            "video_id": video.id,
+            "user_id": user.id,
+            "username": user.username,
+            "created": True
+        }
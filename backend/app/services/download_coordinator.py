@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class DownloadLeaseTimeout(TimeoutError):
+    """Raised when another worker holds a download lease for longer than the wait timeout."""
+    def __init__(self, key: str, timeout: float):
+        super().__init__(f"Timed out after {timeout:.0f}s waiting for the download of {key} by another worker")
+        self.key = key
+        self.timeout = timeout
+
+class DownloadCoordinator:
+    """
+    Per-video download leases shared by every worker process on the host.
+
+    A lease is an flock()ed file in TEMP_DIR/.locks, dropped automatically if the holder
+    process dies. Waiters block in flock(), so they wake up as soon as it is released, but give
+    up after DOWNLOAD_LEASE_TIMEOUT, so a hung download can't pin the waiting requests forever.
+    The lease file is removed on release, so the directory doesn't grow with every video ever seen.
+    """
+    # Fallback for platforms without fcntl: only coordinates threads of one process
+    _thread_locks = {}
+    _thread_locks_lock = threading.Lock()
+
+    def __init__(self, lock_dir: Optional[Path] = None):
+        self.lock_dir = lock_dir or settings.TEMP_DIR / ".locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _lease_path(self, key: str) -> Path:
+        return self.lock_dir / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.lock"
+
+    @contextmanager
+    def lease(self, key: str, timeout: Optional[float] = None):
+        """
+        Hold the exclusive download lease for `key` (e.g. a video id) while in the block.
+        Raises DownloadLeaseTimeout if it isn't free within `timeout` (default DOWNLOAD_LEASE_TIMEOUT) seconds.
+        """
+        timeout = settings.DOWNLOAD_LEASE_TIMEOUT if timeout is None else timeout
+        if fcntl is None:
+            with self._thread_lock(key, timeout):
+                yield
+            return
+
+        path = self._lease_path(key)
+        start_time = time.time()
+        fd = self._acquire(path, key, time.monotonic() + timeout, timeout)
+        waited = time.time() - start_time
+        if waited > 0.1:
+            logger.info(f"Waited {waited:.1f}s for download lease {key}")
+        try:
+            yield
+        finally:
+            # Unlink while still holding the lock; waiters notice and retry on a fresh file
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _lock(self, fd: int, key: str, deadline: float, timeout: float):
+        """
+        flock(LOCK_EX) that gives up at `deadline`; `fd` is closed if it raises.
+        A taken lease is waited for by a helper thread blocked in flock(), so the waiter wakes up
+        as soon as the holder releases it. A waiter that gives up leaves `fd` to the helper,
+        which closes it (dropping the lock, if it got it) once its flock() returns.
+        """
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+        except BaseException:
+            os.close(fd)
+            raise
+
+        done = threading.Event()
+        guard = threading.Lock()
+        state = {"abandoned": False, "error": None}
+
+        def wait_for_lock():
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError as e:
+                state["error"] = e
+            with guard:
+                if state["abandoned"]:
+                    os.close(fd)
+                    return
+                done.set()
+
+        threading.Thread(target=wait_for_lock, name=f"download-lease-{key}", daemon=True).start()
+        try:
+            if not done.wait(max(deadline - time.monotonic(), 0)):
+                raise DownloadLeaseTimeout(key, timeout)
+        except BaseException:
+            with guard:
+                if not done.is_set():
+                    state["abandoned"] = True
+                    raise
+            # The lock arrived while giving up, release it here
+            os.close(fd)
+            raise
+        if state["error"]:
+            os.close(fd)
+            raise state["error"]
+
+    def _acquire(self, path: Path, key: str, deadline: float, timeout: float) -> int:
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._lock(fd, key, deadline, timeout)
+            # The previous holder (or stale lease cleanup) may have unlinked the file we locked
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+        lease_info = {"pid": os.getpid(), "acquired_at": time.time()}
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps(lease_info).encode("utf-8"))
+        return fd
+
+    @contextmanager
+    def _thread_lock(self, key: str, timeout: float):
+        with self._thread_locks_lock:
+            lock, users = self._thread_locks.get(key, (threading.Lock(), 0))
+            self._thread_locks[key] = (lock, users + 1)
+        try:
+            if not lock.acquire(timeout=timeout):
+                raise DownloadLeaseTimeout(key, timeout)
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            with self._thread_locks_lock:
+                lock, users = self._thread_locks[key]
+                if users == 1:
+                    del self._thread_locks[key]
+                else:
+                    self._thread_locks[key] = (lock, users - 1)
+
+    def cleanup_stale(self) -> int:
+        """
+        Removes lease files left behind by processes that died while downloading.
+        A lease file nobody holds a lock on is stale. Returns the number of removed files.
+        """
+        if fcntl is None:
+            return 0
+
+        removed = 0
+        for path in self.lock_dir.glob("*.lock"):
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)  # Held by a live download
+                continue
+            try:
+                owner = os.read(fd, 1024).decode("utf-8", errors="replace") or "unknown"
+                path.unlink()
+                removed += 1
+                logger.info(f"Removed stale download lease {path.name} (owner: {owner})")
+            except FileNotFoundError:
+                pass
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        return removed
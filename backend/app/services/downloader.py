@@ -1,10 +1,13 @@
 import yt_dlp
 from pathlib import Path
+import copy
 import logging
-import threading
-import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from urllib.parse import urlparse
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.services.download_coordinator import DownloadCoordinator
 
 logger = logging.getLogger(__name__)
 
@@ -29,127 +32,232 @@ def detect_platform(url: str) -> str:
     else:
         return 'Unknown'
 
+@lru_cache()
+def _get_extractor_classes() -> list:
+    # The generic extractor matches any URL and can only tell the id after fetching the page
+    return [extractor for extractor in yt_dlp.extractor.gen_extractor_classes() if extractor.ie_key() != 'Generic']
+
 class DownloaderService:
-    # Class-level locks to prevent concurrent downloads of the same video
-    _download_locks = {}
-    _locks_lock = threading.Lock()
-    
-    def _get_lock(self, video_id: str) -> threading.Lock:
-        """Get or create a lock for a specific video_id."""
-        with self._locks_lock:
-            if video_id not in self._download_locks:
-                self._download_locks[video_id] = threading.Lock()
-            return self._download_locks[video_id]
-    
-    def _wait_for_file(self, file_path: Path, max_wait: int = 30) -> bool:
-        """Wait for a file to be available (not being downloaded)."""
-        wait_time = 0
-        while wait_time < max_wait:
-            if file_path.exists():
-                # Check if it's still being downloaded (.part file exists)
-                part_file = Path(str(file_path) + '.part')
-                if not part_file.exists():
-                    return True
-            time.sleep(0.5)
-            wait_time += 0.5
-        return file_path.exists()
+    # Resolved metadata shared by all requests in this process
+    _metadata_cache = TTLCache(maxsize=settings.METADATA_CACHE_SIZE, ttl=settings.METADATA_CACHE_TTL)
+
+    def __init__(self):
+        # Per-video download leases, shared with the other worker processes
+        self.coordinator = DownloadCoordinator()
     
-    def download(self, url: str) -> dict:
+    def resolve_video_key(self, url: str) -> Optional[Tuple[str, str]]:
         """
-        Downloads video from URL using yt-dlp.
-        Returns a dictionary with video_path, video_id, and metadata.
-        Handles concurrent downloads by checking if file exists and using locks.
+        Resolves (extractor key, video id) from the URL alone, without any network request.
+        Returns None if no specific extractor recognizes the URL.
         """
-        logger.info(f"Starting download for URL: {url}")
+        for extractor in _get_extractor_classes():
+            if extractor.suitable(url):
+                video_id = extractor.get_temp_id(url)
+                return (extractor.ie_key(), video_id) if video_id else None
+        return None
+
+    def expand_urls(self, url: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Expands a channel / playlist URL into the URLs of its videos with a single flat
+        metadata pass (no per-video requests). A single video URL is returned as-is.
+        """
+        ydl_opts = {
+            'extract_flat': 'in_playlist',
+            'quiet': True,
+        }
+        if limit:
+            ydl_opts['playlistend'] = limit
+
+        urls = []
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            logger.info(f"Expanding {url}...")
+            info = ydl.extract_info(url, download=False)
+            pending = [info]
+            while pending and (not limit or len(urls) < limit):
+                entry = pending.pop(0)
+                if entry.get('_type') == 'playlist':
+                    pending = [e for e in (entry.get('entries') or []) if e] + pending
+                elif entry.get('_type') == 'url' and entry.get('ie_key') == 'YoutubeTab':
+                    # Channel root: the "Videos" / "Shorts" tabs are nested playlists
+                    pending = [ydl.extract_info(entry['url'], download=False)] + pending
+                else:
+                    video_url = entry.get('webpage_url') or entry.get('url')
+                    if video_url:
+                        urls.append(video_url)
+
+        logger.info(f"Expanded {url} into {len(urls)} videos")
+        return urls
+
+    def _format_options(self, video_id: str) -> dict:
+        """
+        yt-dlp format selection and output template for the configured DOWNLOAD_PROFILE.
+        
+        "full" downloads the best mp4 quality. "analysis" only needs what the pipeline uses
+        (a few 512px frames and 16 kHz audio): the lowest resolution whose short side is at
+        least 512px plus the smallest audio stream. With DOWNLOAD_SPLIT_STREAMS they are
+        stored as two files and never merged.
+        """
+        if settings.DOWNLOAD_PROFILE != "analysis":
+            return {
+                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+                'outtmpl': str(settings.TEMP_DIR / '%(id)s.%(ext)s'),
+            }
+        
+        size = settings.DOWNLOAD_MIN_SHORT_SIDE
+        video_filter = f"[width>={size}][height>={size}]"
+        # Reversed sort order: "best" now means smallest resolution / bitrate / size
+        options = {'format_sort': ['+res', '+br', '+size']}
+        if settings.DOWNLOAD_SPLIT_STREAMS:
+            options.update({
+                'format': f"bv*{video_filter},ba/b{video_filter}/b",
+                'outtmpl': str(settings.TEMP_DIR / f"{video_id}.analysis-%(height&video|audio)s.%(ext)s"),
+            })
+        else:
+            options.update({
+                'format': f"bv*{video_filter}+ba/b{video_filter}/bv*+ba/b",
+                'outtmpl': str(settings.TEMP_DIR / f"{video_id}.analysis.%(ext)s"),
+            })
+        return options
+
+    def _find_downloaded(self, video_id: str, ext: str) -> Tuple[Optional[Path], Optional[Path]]:
+        """
+        Returns (video_path, audio_path) of complete files already on disk for this profile.
+        audio_path is the same as video_path unless the streams were stored separately.
+        """
+        if settings.DOWNLOAD_PROFILE != "analysis":
+            # Fallback check for .mp4 if extension differs
+            for candidate in (settings.TEMP_DIR / f"{video_id}.{ext}", settings.TEMP_DIR / f"{video_id}.mp4"):
+                if candidate.exists():
+                    return candidate, candidate
+            return None, None
+        
+        def complete(pattern: str) -> Optional[Path]:
+            for candidate in sorted(settings.TEMP_DIR.glob(pattern)):
+                if candidate.suffix not in ('.part', '.ytdl', '.temp'):
+                    return candidate
+            return None
+        
+        merged = complete(f"{video_id}.analysis.*")
+        if merged:
+            return merged, merged
+        video_path = complete(f"{video_id}.analysis-video.*")
+        audio_path = complete(f"{video_id}.analysis-audio.*")
+        if video_path:
+            # Sources without separate streams only produce the combined "video" file
+            return video_path, audio_path or video_path
+        return None, None
+
+    def _resolve_metadata(self, url: str, refresh: bool = False) -> Tuple[dict, bool]:
+        """
+        Returns (info, from_cache). `info` is the raw, unprocessed yt-dlp info dict: title, uploader,
+        counts, duration and the format list. Cached per canonical video id for METADATA_CACHE_TTL,
+        so a repeat request for a downloaded video makes no platform requests at all.
+        The cached dict is shared, callers must not modify it (deep-copy it before handing it to yt-dlp).
+        """
+        video_key = self.resolve_video_key(url)
+        cache_key = ":".join(video_key) if video_key else url
+        
+        if not refresh:
+            info = self._metadata_cache.get(cache_key)
+            if info is not None:
+                logger.info(f"Metadata cache hit for {cache_key}")
+                return info, True
         
-        # First, extract info without downloading to get video_id
         ydl_opts_info = {
             'noplaylist': True,
             'quiet': True,
         }
+        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
+            logger.info("Extracting video info...")
+            # Unprocessed result: no format is selected yet, so the download step
+            # can still apply its own format options to the same info
+            info = ydl.extract_info(url, download=False, process=False)
+            # Follow references to the actual video (e.g. a watch URL inside a playlist)
+            for _ in range(3):
+                if info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+            # Not sanitized: sanitize_info() is meant for JSON output and drops the private
+            # keys process_ie_result() relies on for format selection
+        
+        canonical_key = f"{info.get('extractor_key')}:{info.get('id')}"
+        self._metadata_cache.set(canonical_key, info)
+        # URLs the offline resolver can't parse are cached as-is. A parsed key that differs from
+        # the canonical one (e.g. a playlist id in a watch URL) must not be cached: it may point to other videos.
+        if not video_key:
+            self._metadata_cache.set(url, info)
+        return info, False
+
+    def download(self, url: str) -> dict:
+        """
+        Downloads video from URL using yt-dlp.
+        Returns a dictionary with video_path, audio_path, video_id, and metadata.
+        Handles concurrent downloads by checking if file exists and using per-video leases.
+        """
+        logger.info(f"Starting download for URL: {url}")
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-                logger.info("Extracting video info...")
-                info = ydl.extract_info(url, download=False)
-                video_id = info.get('id')
-                ext = info.get('ext', 'mp4')
-                
-                # Construct expected path
-                filename = f"{video_id}.{ext}"
-                file_path = settings.TEMP_DIR / filename
-                
-                # Fallback check for .mp4 if extension differs
-                if not file_path.exists():
-                    mp4_path = settings.TEMP_DIR / f"{video_id}.mp4"
-                    if mp4_path.exists():
-                        file_path = mp4_path
-                        ext = 'mp4'
-                
-                # Get lock for this video_id
-                lock = self._get_lock(video_id)
-                
-                with lock:
-                    # Check if file already exists and is complete
-                    if file_path.exists():
-                        part_file = Path(str(file_path) + '.part')
-                        if part_file.exists():
-                            # File is being downloaded, wait for it
-                            logger.info(f"File {file_path} is being downloaded by another request, waiting...")
-                            if not self._wait_for_file(file_path):
-                                raise Exception(f"Timeout waiting for file {file_path} to be available")
-                            logger.info(f"File {file_path} is now available")
-                        else:
-                            # File exists and is complete, just extract metadata
-                            logger.info(f"File {file_path} already exists, skipping download")
-                    else:
-                        # File doesn't exist, download it
-                        ydl_opts = {
-                            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                            'outtmpl': str(settings.TEMP_DIR / '%(id)s.%(ext)s'),
-                            'noplaylist': True,
-                            'quiet': True,
-                            'overwrites': True,
-                        }
-                        
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                            logger.info(f"Downloading video {video_id}...")
-                            info = ydl_download.extract_info(url, download=True)
-                            logger.info(f"Download completed: {file_path}")
+            # Single metadata resolution per request (or none, if it is cached)
+            info, from_cache = self._resolve_metadata(url)
+            video_id = info.get('id')
+            ext = info.get('ext', 'mp4')
+            
+            # Only one request (in any worker process) downloads a given video; the others
+            # wait here until it finishes (at most DOWNLOAD_LEASE_TIMEOUT) and then find the file on disk
+            with self.coordinator.lease(video_id):
+                video_path, audio_path = self._find_downloaded(video_id, ext)
+                if video_path:
+                    # File exists and is complete, metadata is already known
+                    logger.info(f"File {video_path} already exists, skipping download")
+                else:
+                    # File doesn't exist, download it
+                    ydl_opts = {
+                        **self._format_options(video_id),
+                        'noplaylist': True,
+                        'quiet': True,
+                        'overwrites': True,
+                    }
+                    
+                    with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
+                        logger.info(f"Downloading video {video_id} ({settings.DOWNLOAD_PROFILE} profile)...")
+                        try:
+                            # Reuse the resolved info instead of extracting it again
+                            ydl_download.process_ie_result(copy.deepcopy(info), download=True)
+                        except yt_dlp.utils.DownloadError as e:
+                            if not from_cache:
+                                raise
+                            # Signed format URLs in cached metadata may have expired
+                            logger.warning(f"Download from cached metadata failed ({e}), resolving again...")
+                            info, _ = self._resolve_metadata(url, refresh=True)
+                            ydl_download.process_ie_result(copy.deepcopy(info), download=True)
                     
-                    # Verify file exists after download/wait
-                    if not file_path.exists():
-                        # Try mp4 extension
-                        mp4_path = settings.TEMP_DIR / f"{video_id}.mp4"
-                        if mp4_path.exists():
-                            file_path = mp4_path
-                        else:
-                            raise Exception(f"Downloaded file not found: {file_path}")
-                
-                # Extract metadata (re-fetch if we used cached file)
-                if 'title' not in info or not info.get('title'):
-                    with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-                        info = ydl.extract_info(url, download=False)
-                
-                # Detect platform from URL
-                platform = detect_platform(url)
-                
-                metadata = {
-                    "video_id": video_id,
-                    "video_path": file_path,
-                    "title": info.get('title', 'Unknown Title'),
-                    "uploader": info.get('uploader', 'Unknown Author'),
-                    "view_count": info.get('view_count', 0) or 0,
-                    "like_count": info.get('like_count', 0) or 0,
-                    "comment_count": info.get('comment_count', 0) or 0,
-                    "duration": info.get('duration', 0) or 0,
-                    "platform": platform,  # Add platform to metadata
-                }
-                
-                logger.info(f"Metadata extracted: {metadata['view_count']} views, {metadata['like_count']} likes")
-                
-                return metadata
-                
+                    # Verify file exists after download
+                    video_path, audio_path = self._find_downloaded(video_id, ext)
+                    if not video_path:
+                        raise Exception(f"Downloaded file not found for video {video_id}")
+                    logger.info(f"Download completed: {video_path} ({video_path.stat().st_size} bytes)")
+            
+            # Detect platform from URL
+            platform = detect_platform(url)
+            
+            metadata = {
+                "video_id": video_id,
+                "video_path": video_path,
+                "audio_path": audio_path,
+                "title": info.get('title', 'Unknown Title'),
+                "uploader": info.get('uploader', 'Unknown Author'),
+                "view_count": info.get('view_count', 0) or 0,
+                "like_count": info.get('like_count', 0) or 0,
+                "comment_count": info.get('comment_count', 0) or 0,
+                "duration": info.get('duration', 0) or 0,
+                "platform": platform,  # Add platform to metadata
+                "extractor_key": info.get('extractor_key') or info.get('ie_key'),
+            }
+            
+            logger.info(f"Metadata extracted: {metadata['view_count']} views, {metadata['like_count']} likes")
+            
+            return metadata
+            
         except Exception as e:
             logger.error(f"Failed to download video: {str(e)}")
             raise Exception(f"Failed to download video: {str(e)}")
@@ -1,32 +1,47 @@
-import google.generativeai as genai
 import logging
 import json
 import time
+import copy
+import hashlib
+import re
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Iterator, List, Tuple
 from sqlmodel import Session, select
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.executors import get_executor
 from app.models import UserProfile
+from app.services.llm_client import LLMClient, parse_json_response
 
 logger = logging.getLogger(__name__)
 
+def profile_fingerprint(master_profile: dict) -> str:
+    """Hash of the Master Profile content; changes whenever the profile is rewritten."""
+    canonical = json.dumps(master_profile, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def normalize_topic(topic: str) -> str:
+    """Case, whitespace and trailing punctuation don't make a different topic."""
+    topic = unicodedata.normalize("NFKC", topic).casefold()
+    topic = re.sub(r"\s+", " ", topic).strip()
+    return topic.rstrip(".!?…").strip()
+
 class GeneratorService:
+    # Generated scripts by (username, profile fingerprint, normalized topic). A new Master Profile
+    # has a new fingerprint, so scripts generated from the old one are never returned again.
+    _script_cache = TTLCache(maxsize=settings.SCRIPT_CACHE_SIZE, ttl=settings.SCRIPT_CACHE_TTL)
+
     def __init__(self):
         api_key = settings.GOOGLE_API_KEY
         if not api_key:
             logger.warning("GOOGLE_API_KEY is not set. GeneratorService will fail if called.")
         else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(
-                'models/gemini-2.5-flash',
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            self.llm = LLMClient('models/gemini-2.5-flash')
             logger.info("Gemini client initialized for script generation")
 
-    def generate_script(self, username: str, topic: str, session: Session) -> dict:
-        """
-        Generates a new video script based on the author's Master Profile from DB using Gemini.
-        """
+    def get_master_profile(self, username: str, session: Session) -> dict:
+        """Master Profile of `username`; ValueError if there is none yet."""
         if not settings.GOOGLE_API_KEY:
              raise ValueError("GOOGLE_API_KEY is missing in environment variables.")
 
@@ -36,10 +51,11 @@ class GeneratorService:
         
         if not user or not user.master_profile:
             raise ValueError(f"No Master Profile found for user '{username}'. Please analyze at least one video first.")
+        return user.master_profile
 
-        logger.info(f"Generating script for {username} on topic: '{topic}'...")
-        
-        system_instruction = f"""
+    def _build_prompt(self, username: str, topic: str, profile_json: str) -> str:
+        """`profile_json` is the serialized Master Profile, so batches serialize it only once."""
+        return f"""
         КРИТИЧЕСКИ ВАЖНО: Ты генерируешь контент для русскоязычной аудитории.
         ВЕСЬ выходной текст (заголовок, сценарий, ремарки, советы) должен быть СТРОГО на РУССКОМ языке.
         
@@ -59,7 +75,7 @@ class GeneratorService:
         Your task is to write a VIRAL script on the topic: '{topic}'.
         
         You MUST strictly follow your own 'DNA' described in your Master Profile:
-        {json.dumps(user.master_profile, indent=2, ensure_ascii=False)}
+        {profile_json}
         
         INSTRUCTIONS:
         1. Tone & Pacing: Match your 'tone_of_voice' and 'avg_pacing_wpm'.
@@ -76,33 +92,206 @@ class GeneratorService:
         }}
         """
 
-        # Retry logic for 429 errors
-        max_attempts = 2
-        for attempt in range(max_attempts):
+    def _cache_key(self, username: str, topic: str, fingerprint: str) -> tuple:
+        return (username, fingerprint, normalize_topic(topic))
+
+    def generate_script(self, username: str, topic: str, session: Session, regenerate: bool = False) -> dict:
+        """
+        Generates a new video script based on the author's Master Profile from DB using Gemini.
+        The same topic against an unchanged profile is served from cache unless `regenerate` is set.
+        """
+        master_profile = self.get_master_profile(username, session)
+        return self._generate(
+            username, topic, profile_fingerprint(master_profile), self._serialize_profile(master_profile), regenerate
+        )
+
+    def _serialize_profile(self, master_profile: dict) -> str:
+        return json.dumps(master_profile, indent=2, ensure_ascii=False)
+
+    def _generate(self, username: str, topic: str, fingerprint: str, profile_json: str, regenerate: bool) -> dict:
+        cache_key = self._cache_key(username, topic, fingerprint)
+        if not regenerate:
+            cached = self._script_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Script cache hit for {username} on topic: '{topic}'")
+                return copy.deepcopy(cached)
+
+        logger.info(f"Generating script for {username} on topic: '{topic}'...")
+        system_instruction = self._build_prompt(username, topic, profile_json)
+
+        try:
+            start_time = time.time()
+            response = self.llm.generate(system_instruction)
+            duration = time.time() - start_time
+            logger.info(f"Script generation completed in {duration:.2f}s")
+            
+            script_data = parse_json_response(response.text)
+            self._script_cache.set(cache_key, copy.deepcopy(script_data))
+            return script_data
+            
+        except Exception as e:
+            logger.error(f"Gemini API Error (Generation): {e}")
+            raise Exception(f"Failed to generate script: {e}")
+
+    def generate_batch(self, username: str, topics: List[str], session: Session, regenerate: bool = False) -> List[dict]:
+        """
+        Generates scripts for several topics of one user. The profile is loaded and serialized once,
+        the Gemini calls run in parallel on the "llm" executor (at most GENERATE_BATCH_CONCURRENCY at a time), and every topic
+        gets its own result: {"topic", "status": "success" | "error", "script_data", "error"}.
+        Topics that only differ in case/whitespace/punctuation are generated once.
+        """
+        master_profile = self.get_master_profile(username, session)
+        fingerprint = profile_fingerprint(master_profile)
+        profile_json = self._serialize_profile(master_profile)
+
+        unique_topics = {}
+        for topic in topics:
+            unique_topics.setdefault(normalize_topic(topic), topic)
+        logger.info(f"Generating {len(unique_topics)} scripts for {username} ({len(topics)} topics requested)...")
+
+        def generate_one(topic: str) -> dict:
             try:
-                start_time = time.time()
-                response = self.model.generate_content(system_instruction)
-                duration = time.time() - start_time
-                logger.info(f"Script generation completed in {duration:.2f}s")
-                
-                response_text = response.text.strip()
-                
-                # Cleanup markdown if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                    
-                return json.loads(response_text)
-                
+                script_data = self._generate(username, topic, fingerprint, profile_json, regenerate)
+                return {"status": "success", "script_data": script_data, "error": None}
             except Exception as e:
-                error_str = str(e)
-                is_rate_limit = "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower()
-                
-                if is_rate_limit and attempt < max_attempts - 1:
-                    logger.warning(f"Gemini API 429 error (attempt {attempt + 1}/{max_attempts}). Retrying in 10s...")
-                    time.sleep(10)
-                    continue
-                else:
-                    logger.error(f"Gemini API Error (Generation): {e}")
-                    raise Exception(f"Failed to generate script: {e}")
+                return {"status": "error", "script_data": None, "error": str(e)}
+
+        start_time = time.time()
+        executor = get_executor("llm")
+        window = max(1, settings.GENERATE_BATCH_CONCURRENCY)
+        waiting = list(unique_topics.items())
+        running = {}
+        results = {}
+        # Only `window` topics are on the executor at once, so one batch can't crowd out analyses
+        while waiting or running:
+            while waiting and len(running) < window:
+                key, topic = waiting.pop(0)
+                running[executor.submit(generate_one, topic)] = key
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+        logger.info(f"Batch generation for {username} completed in {time.time() - start_time:.2f}s")
+
+        return [{"topic": topic, **copy.deepcopy(results[normalize_topic(topic)])} for topic in topics]
+
+    def stream_script(self, username: str, topic: str, master_profile: dict, regenerate: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming counterpart of generate_script. Yields (event, data) pairs:
+        "title" as soon as the title is complete, "script_item" for every finished script block
+        (the hook first), then "done" with the whole script.
+        """
+        cache_key = self._cache_key(username, topic, profile_fingerprint(master_profile))
+        cached = None if regenerate else self._script_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Script cache hit for {username} on topic: '{topic}'")
+            yield "title", cached.get("title", "")
+            for index, item in enumerate(cached.get("script", [])):
+                yield "script_item", {"index": index, "item": item}
+            yield "done", copy.deepcopy(cached)
+            return
+
+        logger.info(f"Streaming script for {username} on topic: '{topic}'...")
+        start_time = time.time()
+        parser = ScriptStreamParser()
+        try:
+            system_instruction = self._build_prompt(username, topic, self._serialize_profile(master_profile))
+            for chunk in self.llm.generate_stream(system_instruction):
+                for event in parser.feed(chunk):
+                    if event[0] == "title":
+                        logger.info(f"Script title streamed after {time.time() - start_time:.2f}s")
+                    yield event
+            script_data = parse_json_response(parser.buffer)
+        except Exception as e:
+            logger.error(f"Gemini API Error (Streaming generation): {e}")
+            raise Exception(f"Failed to generate script: {e}")
+
+        logger.info(f"Script streaming completed in {time.time() - start_time:.2f}s")
+        self._script_cache.set(cache_key, copy.deepcopy(script_data))
+        yield "done", script_data
+
+class ScriptStreamParser:
+    """
+    Extracts the title and completed `script` items from a script JSON that is still being received.
+    """
+    TITLE_PATTERN = re.compile(r'"title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+    SCRIPT_PATTERN = re.compile(r'"script"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.title = None
+        self.items = 0
+        self._pos = None  # Scan position inside the script array, None until it starts
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self._finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        events = []
+
+        if self.title is None:
+            self.title = self._find_title()
+            if self.title is not None:
+                events.append(("title", self.title))
+
+        if self._pos is None:
+            match = self.SCRIPT_PATTERN.search(self.buffer)
+            if not match:
+                return events
+            self._pos = match.end()
+
+        while not self._finished and self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    item = json.loads(self.buffer[self._item_start:self._pos + 1])
+                    events.append(("script_item", {"index": self.items, "item": item}))
+                    self.items += 1
+            elif char == "]" and self._depth == 0:
+                self._finished = True
+            self._pos += 1
+        return events
+
+    def _find_title(self):
+        """The top-level "title" value once it is complete, wherever the model put the key."""
+        for match in self.TITLE_PATTERN.finditer(self.buffer):
+            if self._is_top_level_key(match.start()):
+                return json.loads(f'"{match.group(1)}"')
+        return None
+
+    def _is_top_level_key(self, position: int) -> bool:
+        """True if `position` is outside of strings, directly inside the outermost object."""
+        depth = 0
+        in_string = False
+        escape = False
+        for char in self.buffer[:position]:
+            if in_string:
+                if escape:
+                    escape = False
+                elif char == "\\":
+                    escape = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+        return depth == 1 and not in_string
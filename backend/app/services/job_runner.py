@@ -0,0 +1,237 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.executors import BoundedExecutor
+from app.models import AnalysisJob, AnalysisBatch, UserProfile
+from app.services.analysis_pipeline import AnalysisPipeline
+from app.services.profile_scheduler import ProfileRebuildScheduler
+
+logger = logging.getLogger(__name__)
+
+class AnalysisJobRunner:
+    """
+    Runs analysis jobs on a bounded in-process worker pool.
+    Job state lives in the AnalysisJob table, so clients can poll it and
+    queued jobs survive a restart.
+
+    Several worker processes may share the table. A job is claimed atomically (queued -> running),
+    so it runs at most once; the claiming runner becomes its owner and keeps refreshing its heartbeat.
+    Only running jobs whose heartbeat is older than JOB_LEASE_TIMEOUT are failed as interrupted,
+    never the jobs of another live worker.
+    """
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], AnalysisPipeline],
+        profile_scheduler: Optional[ProfileRebuildScheduler] = None,
+        max_workers: Optional[int] = None
+    ):
+        self.pipeline_factory = pipeline_factory
+        self.profile_scheduler = profile_scheduler
+        self.max_workers = max_workers or settings.ANALYSIS_WORKERS
+        # Submissions are rejected (ExecutorOverloaded) once JOB_MAX_QUEUE jobs are waiting
+        self._executor = BoundedExecutor("analysis-job", self.max_workers, settings.JOB_MAX_QUEUE)
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopped = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="analysis-job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        logger.info(f"Analysis job runner {self.owner_id} started with {self.max_workers} workers")
+
+    def create_job(self, url: str, session: Session, user_id: Optional[int] = None, force: bool = False) -> AnalysisJob:
+        """Persist a new job and schedule it for execution. Raises ExecutorOverloaded if the queue is full."""
+        with self._executor.admit() as admission:
+            job = AnalysisJob(url=url, user_id=user_id, force=force)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+
+            admission.submit(self._run, job.id)
+        logger.info(f"Queued analysis job {job.id} for URL: {url}")
+        return job
+
+    def create_batch(
+        self,
+        urls: List[str],
+        session: Session,
+        user_id: Optional[int] = None,
+        force: bool = False,
+        source: Optional[str] = None
+    ) -> AnalysisBatch:
+        """
+        Persist a bulk ingest: one job per URL, all sharing a batch id.
+        Batch jobs don't touch the Master Profile; it is rebuilt once after the last job finished.
+        The whole batch is rejected (ExecutorOverloaded) if it doesn't fit into the queue.
+        """
+        with self._executor.admit(len(urls)) as admission:
+            batch = AnalysisBatch(user_id=user_id, source=source, total=len(urls))
+            session.add(batch)
+            session.commit()
+            session.refresh(batch)
+
+            jobs = [AnalysisJob(url=url, user_id=user_id, force=force, batch_id=batch.id) for url in urls]
+            session.add_all(jobs)
+            session.commit()
+
+            for job in jobs:
+                admission.submit(self._run, job.id)
+        logger.info(f"Queued analysis batch {batch.id} with {len(jobs)} videos")
+        return batch
+
+    def submit(self, job_id: str):
+        self._executor.submit(self._run, job_id)
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs submitted to this process and not finished yet."""
+        return self._executor.pending
+
+    def stats(self) -> dict:
+        return self._executor.stats()
+
+    def resume_pending(self):
+        """
+        Called on startup. Running jobs of dead worker processes are marked failed, jobs that were
+        still queued are scheduled again (another worker may claim them first, they still run once),
+        batches without pending jobs are completed.
+        """
+        self.fail_stale_jobs()
+        with Session(engine) as session:
+            queued = session.exec(
+                select(AnalysisJob).where(AnalysisJob.status == "queued").order_by(AnalysisJob.created_at)
+            ).all()
+            queued_ids = [job.id for job in queued]
+
+            batch_ids = session.exec(select(AnalysisBatch.id).where(AnalysisBatch.status == "running")).all()
+
+        for batch_id in batch_ids:
+            self._finish_batch_if_done(batch_id)
+        for job_id in queued_ids:
+            self.submit(job_id)
+        if queued_ids:
+            logger.info(f"Resumed {len(queued_ids)} queued analysis jobs")
+
+    def fail_stale_jobs(self) -> int:
+        """
+        Marks running jobs failed whose owner stopped refreshing their heartbeat (its process died).
+        Returns the number of failed jobs.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+        stale = (
+            AnalysisJob.status == "running",
+            or_(AnalysisJob.owner.is_(None), AnalysisJob.owner != self.owner_id),
+            or_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.heartbeat_at < cutoff)
+        )
+        with Session(engine) as session:
+            jobs = session.exec(select(AnalysisJob.id, AnalysisJob.batch_id).where(*stale)).all()
+            if not jobs:
+                return 0
+            # Same condition again: a heartbeat that arrived in the meantime keeps the job alive
+            result = session.exec(
+                update(AnalysisJob)
+                .where(AnalysisJob.id.in_([job_id for job_id, _ in jobs]), *stale)
+                .values(status="failed", error="Interrupted by server restart", finished_at=datetime.utcnow())
+            )
+            session.commit()
+
+        logger.warning(f"Marked {result.rowcount} interrupted analysis jobs as failed")
+        for batch_id in {batch_id for _, batch_id in jobs if batch_id}:
+            self._finish_batch_if_done(batch_id)
+        return result.rowcount
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            try:
+                with Session(engine) as session:
+                    session.exec(
+                        update(AnalysisJob)
+                        .where(AnalysisJob.owner == self.owner_id, AnalysisJob.status == "running")
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    session.commit()
+                self.fail_stale_jobs()
+            except Exception as e:
+                logger.warning(f"Analysis job heartbeat failed: {e}")
+
+    def shutdown(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _claim(self, session: Session, job_id: str) -> bool:
+        """queued -> running in a single conditional UPDATE, so only one runner gets the job."""
+        now = datetime.utcnow()
+        result = session.exec(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+            .values(status="running", owner=self.owner_id, started_at=now, heartbeat_at=now)
+        )
+        session.commit()
+        return bool(result.rowcount)
+
+    def _run(self, job_id: str):
+        with Session(engine) as session:
+            if not self._claim(session, job_id):
+                return
+            job = session.get(AnalysisJob, job_id)
+
+            logger.info(f"Analysis job {job_id} started")
+            try:
+                result = self.pipeline_factory().run(
+                    job.url,
+                    session,
+                    current_user_id=job.user_id,
+                    force=job.force,
+                    update_profile=job.batch_id is None
+                )
+                job.status = "completed"
+                job.result = result
+                logger.info(f"Analysis job {job_id} completed")
+            except Exception as e:
+                logger.error(f"Analysis job {job_id} failed: {str(e)}", exc_info=True)
+                session.rollback()
+                job.status = "failed"
+                job.error = str(e)
+
+            job.finished_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+            batch_id = job.batch_id
+
+        if batch_id:
+            self._finish_batch_if_done(batch_id)
+
+    def _finish_batch_if_done(self, batch_id: str):
+        """Marks the batch completed once none of its jobs is pending and schedules the profile rebuilds."""
+        with Session(engine) as session:
+            pending = session.exec(
+                select(AnalysisJob.id)
+                .where(AnalysisJob.batch_id == batch_id, AnalysisJob.status.in_(["queued", "running"]))
+            ).first()
+            if pending:
+                return
+
+            # Only one of the jobs finishing concurrently gets to complete the batch
+            result = session.exec(
+                update(AnalysisBatch)
+                .where(AnalysisBatch.id == batch_id, AnalysisBatch.status == "running")
+                .values(status="completed", finished_at=datetime.utcnow())
+            )
+            session.commit()
+            if not result.rowcount:
+                return
+
+            jobs = session.exec(select(AnalysisJob).where(AnalysisJob.batch_id == batch_id)).all()
+            usernames = {job.result.get("username") for job in jobs if job.status == "completed" and job.result}
+            user_ids = session.exec(select(UserProfile.id).where(UserProfile.username.in_(usernames))).all() if usernames else []
+
+        logger.info(f"Analysis batch {batch_id} completed, rebuilding {len(user_ids)} profiles")
+        if self.profile_scheduler:
+            for user_id in user_ids:
+                self.profile_scheduler.schedule(user_id)
@@ -0,0 +1,225 @@
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from PIL import Image
+from functools import lru_cache
+from typing import Any, Iterator, Optional
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: quota / rate limits and transient server failures
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Gemini bills every attached image as a fixed number of tokens
+IMAGE_TOKENS = 258
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets shared by all Gemini calls of the process.
+    A call waits until both buckets can cover it; limits of 0 are not enforced.
+    """
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+        if self.tpm and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+        return wait
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until a request of `tokens` tokens is allowed. Returns the time spent waiting."""
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        start_time = time.monotonic()
+        with self._condition:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                self._condition.wait(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+        return time.monotonic() - start_time
+
+    def adjust(self, tokens: int):
+        """Corrects the token bucket once the real usage of a request is known (may be negative)."""
+        if not self.tpm or not tokens:
+            return
+        with self._condition:
+            self._refill()
+            self._tokens = min(self.tpm, self._tokens - tokens)
+            self._condition.notify_all()
+
+@lru_cache()
+def get_rate_limiter() -> TokenBucketLimiter:
+    return TokenBucketLimiter(settings.LLM_RPM, settings.LLM_TPM)
+
+@lru_cache()
+def get_concurrency_limit() -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+@lru_cache()
+def _configure():
+    genai.configure(api_key=settings.GOOGLE_API_KEY)
+
+def estimate_tokens(contents: Any) -> int:
+    """Rough prompt size: ~4 characters per token for text, a flat rate per image."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // 4 + 1
+        elif isinstance(part, Image.Image):
+            tokens += IMAGE_TOKENS
+        elif isinstance(part, dict) and "data" in part:
+            tokens += IMAGE_TOKENS
+    return tokens
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested delay from a Retry-After header, a RetryInfo detail or the error message."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("Retry-After"):
+        try:
+            return float(headers["Retry-After"])
+        except ValueError:
+            pass
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    match = re.search(r"retry in (\d+(?:\.\d+)?)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+def chunk_text(chunk) -> str:
+    """
+    Text of a streamed response chunk. Reads the candidate's parts directly: `chunk.text` and
+    `chunk.parts` raise ValueError on chunks without parts or candidates, e.g. a final chunk that
+    only carries a MAX_TOKENS or SAFETY finish reason.
+    """
+    if not chunk.candidates:
+        return ""
+    return "".join(part.text for part in chunk.candidates[0].content.parts if part.text)
+
+class LLMClient:
+    """
+    Gemini model wrapper used by every service that calls the LLM.
+    Calls go through the process-wide rate limiter and concurrency cap, and rate-limited or
+    transient failures are retried with jittered exponential backoff (or the delay the API asks for).
+    """
+    def __init__(self, model_name: str, response_mime_type: Optional[str] = "application/json"):
+        _configure()
+        self.model_name = model_name
+        generation_config = genai.GenerationConfig(response_mime_type=response_mime_type) if response_mime_type else None
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        self.limiter = get_rate_limiter()
+        self.concurrency = get_concurrency_limit()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        suggested = retry_after(error)
+        if suggested is not None:
+            return min(suggested + random.uniform(0, 1), settings.LLM_BACKOFF_MAX)
+        # Full jitter: spreads retries of concurrent callers instead of retrying in lockstep
+        return random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def _record_usage(self, response, estimated_tokens: int):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage else None
+        if isinstance(total, int):
+            self.limiter.adjust(total - estimated_tokens)
+
+    def generate(self, contents: Any, **kwargs):
+        """Synchronous generate_content with rate limiting and retries."""
+        estimated_tokens = estimate_tokens(contents)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            waited = self.limiter.acquire(estimated_tokens)
+            if waited > 0.5:
+                logger.info(f"Gemini request waited {waited:.1f}s for rate limit")
+            try:
+                with self.concurrency:
+                    response = self.model.generate_content(contents, **kwargs)
+                self._record_usage(response, estimated_tokens)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"Gemini {type(e).__name__} (attempt {attempt + 1}/{settings.LLM_MAX_RETRIES + 1}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    async def generate_async(self, contents: Any, **kwargs):
+        """
+        generate() for async callers, run on a worker thread. The rate limit, the concurrency slot
+        and the backoff sleeps all stay in that thread, so the slot is released by its `with` block
+        even when the awaiting task is cancelled (the request still finishes in the background).
+        """
+        return await asyncio.to_thread(self.generate, contents, **kwargs)
+
+    def generate_stream(self, contents: Any, **kwargs) -> Iterator[str]:
+        """
+        Streaming generate_content: yields response text as it is produced.
+        Only failures before the first chunk are retried; the concurrency slot is held until the stream ends.
+        """
+        estimated_tokens = estimate_tokens(contents)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            self.limiter.acquire(estimated_tokens)
+            with self.concurrency:
+                started = False
+                try:
+                    response = self.model.generate_content(contents, stream=True, **kwargs)
+                    for chunk in response:
+                        started = True
+                        text = chunk_text(chunk)
+                        if text:
+                            yield text
+                    self._record_usage(response, estimated_tokens)
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if started or attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"Gemini {type(e).__name__} (attempt {attempt + 1}/{settings.LLM_MAX_RETRIES + 1}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def parse_json_response(response_text: str) -> Any:
+    """Parses a JSON response, dropping a ```json markdown fence if the model added one."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return json.loads(response_text)
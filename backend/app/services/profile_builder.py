@@ -1,119 +1,220 @@
-import google.generativeai as genai
 import logging
 import json
-import time
 from datetime import datetime
+from typing import List
+from sqlalchemy import update
 from sqlmodel import Session, select
 from app.core.config import settings
 from app.models import UserProfile, VideoAnalysis
+from app.services.llm_client import LLMClient, parse_json_response
 
 logger = logging.getLogger(__name__)
 
+PROFILE_LANGUAGE_RULES = """
+        КРИТИЧЕСКИ ВАЖНО: Ты анализируешь и генерируешь контент для русскоязычной аудитории.
+        ВЕСЬ выходной текст (описания, анализ ДНК стиля, советы) должен быть СТРОГО на РУССКОМ языке.
+
+        Правило JSON: Сохраняй ключи JSON на английском (например, 'core_identity', 'winning_formula'),
+        но ВСЕ значения пиши на русском языке.
+
+        Пример правильного формата:
+        {
+            "core_identity": "Эксперт по личным финансам, который объясняет сложные темы простым языком",
+            "winning_formula": ["Быстрая нарезка", "Числа в кадре", "Конкретные примеры"],
+            "tone_of_voice": "Дружелюбный и уверенный, с легкой иронией"
+        }
+"""
+
+PROFILE_OUTPUT_FORMAT = """
+        Output JSON (ключи на английском, значения на русском):
+        {
+            "core_identity": "String на русском. Одно предложение, описывающее суть автора.",
+            "winning_formula": ["String на русском", "String на русском"] (Список ключевых элементов из их самых успешных видео),
+            "tone_of_voice": "String на русском. Постоянный аудио/вербальный стиль",
+            "visual_signature": "String на русском. Постоянные визуальные элементы (цвета, скорость монтажа)",
+            "avg_pacing_wpm": Number,
+            "best_hooks": ["String на русском", "String на русском"] (Примеры успешных хуков, которые они использовали),
+            "weaknesses": "String на русском. Что улучшить на основе менее успешных видео (если есть)"
+        }
+"""
+
+# Number of best performing videos kept in the style digest
+DIGEST_TOP_VIDEOS = 5
+
 class ProfileBuilderService:
     def __init__(self):
         api_key = settings.GOOGLE_API_KEY
         if not api_key:
             logger.warning("GOOGLE_API_KEY is not set. ProfileBuilderService will fail if called.")
         else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(
-                'models/gemini-2.5-flash',
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            self.llm = LLMClient('models/gemini-2.5-flash')
             logger.info("Gemini client initialized for profile building")
 
-    def update_master_profile(self, user_id: int, session: Session):
+    def update_master_profile(self, user_id: int, session: Session, full: bool = False):
         """
-        Synthesizes a 'Master Profile' (DNA of style) based on all analyzed videos of the author using Gemini.
+        Updates the 'Master Profile' (DNA of style) of the author using Gemini.
+
+        Normally only videos analyzed since the last update are merged into the existing profile,
+        together with the compact style digest, so the prompt size doesn't grow with the number of videos.
+        A full re-synthesis from the video history runs for new profiles, every PROFILE_FULL_RESYNC_EVERY
+        updates, when too many new videos piled up, or when `full` is set.
         """
         user = session.get(UserProfile, user_id)
         if not user:
             logger.error(f"User not found: {user_id}")
             return
-            
-        videos = session.exec(select(VideoAnalysis).where(VideoAnalysis.user_id == user_id)).all()
-        
+
+        last_video_id = user.profile_video_id or 0
+        new_videos = session.exec(
+            select(VideoAnalysis)
+            .where(VideoAnalysis.user_id == user_id, VideoAnalysis.id > last_video_id)
+            .order_by(VideoAnalysis.id)
+        ).all()
+
+        needs_full = (
+            full
+            or not user.master_profile
+            or not user.style_digest
+            or user.profile_updates >= settings.PROFILE_FULL_RESYNC_EVERY
+            or len(new_videos) > settings.PROFILE_INCREMENTAL_MAX_VIDEOS
+        )
+        if needs_full:
+            self._full_synthesis(user, session)
+        elif new_videos:
+            self._incremental_update(user, new_videos, session)
+        else:
+            logger.info(f"Master Profile of {user.username} is up to date, no new videos.")
+
+    def _video_summary(self, video: VideoAnalysis) -> dict:
+        return {
+            "title": video.title,
+            "views": video.view_count,
+            "analysis": video.analysis_result
+        }
+
+    def _digest_entry(self, video: VideoAnalysis) -> dict:
+        analysis = video.analysis_result or {}
+        return {
+            "id": video.id,
+            "title": video.title,
+            "views": video.view_count,
+            "hook": str(analysis.get("hook_analysis", ""))[:300],
+            "key_elements": (analysis.get("key_elements") or [])[:5]
+        }
+
+    def _merge_into_digest(self, digest: dict, videos: List[VideoAnalysis]) -> dict:
+        """
+        Digest = running totals plus the few best performing videos; its size is constant.
+        """
+        videos_count = digest.get("videos_count", 0) + len(videos)
+        total_views = digest.get("total_views", 0) + sum(v.view_count for v in videos)
+        top_videos = digest.get("top_videos", []) + [self._digest_entry(v) for v in videos]
+        top_videos = sorted(top_videos, key=lambda entry: entry["views"], reverse=True)[:DIGEST_TOP_VIDEOS]
+        return {
+            "videos_count": videos_count,
+            "total_views": total_views,
+            "avg_views": total_views // videos_count if videos_count else 0,
+            "top_videos": top_videos
+        }
+
+    def _full_synthesis(self, user: UserProfile, session: Session):
+        videos = session.exec(
+            select(VideoAnalysis).where(VideoAnalysis.user_id == user.id).order_by(VideoAnalysis.id)
+        ).all()
+
         if not videos:
             logger.warning("No videos found for profile synthesis.")
             return
 
-        logger.info(f"Synthesizing Master Profile for {user.username} based on {len(videos)} videos.")
-        
+        # The digest covers the whole history, the prompt only the most recent videos
+        digest = self._merge_into_digest({}, videos)
+        recent_videos = videos[-settings.PROFILE_FULL_MAX_VIDEOS:]
+        logger.info(f"Synthesizing Master Profile for {user.username} based on {len(recent_videos)} of {len(videos)} videos.")
+
         # Prepare data for LLM
-        history_summary = []
-        for v in videos:
-            history_summary.append({
-                "title": v.title,
-                "views": v.stats.get("view_count", 0),
-                "analysis": v.analysis_result
-            })
-            
+        history_summary = [self._video_summary(v) for v in recent_videos]
+
         system_instruction = f"""
-        КРИТИЧЕСКИ ВАЖНО: Ты анализируешь и генерируешь контент для русскоязычной аудитории.
-        ВЕСЬ выходной текст (описания, анализ ДНК стиля, советы) должен быть СТРОГО на РУССКОМ языке.
-        
-        Правило JSON: Сохраняй ключи JSON на английском (например, 'core_identity', 'winning_formula'), 
-        но ВСЕ значения пиши на русском языке.
-        
-        Пример правильного формата:
-        {{
-            "core_identity": "Эксперт по личным финансам, который объясняет сложные темы простым языком",
-            "winning_formula": ["Быстрая нарезка", "Числа в кадре", "Конкретные примеры"],
-            "tone_of_voice": "Дружелюбный и уверенный, с легкой иронией"
-        }}
-        
+        {PROFILE_LANGUAGE_RULES}
+
         You are an expert AI Analyst specializing in Creator Economy.
         Your task is to synthesize a "Master Style DNA" (UserProfile) for a creator based on the analysis of their videos.
-        
+
         Creator: {user.username}
+        Style Digest (totals and best performing videos of the whole history): {json.dumps(digest, indent=2, ensure_ascii=False)}
         Analyzed Videos: {json.dumps(history_summary, indent=2, ensure_ascii=False)}
-        
+
         Analyze patterns across these videos. What is consistent? What makes their most viral videos successful?
-        
-        Output JSON (ключи на английском, значения на русском):
-        {{
-            "core_identity": "String на русском. Одно предложение, описывающее суть автора.",
-            "winning_formula": ["String на русском", "String на русском"] (Список ключевых элементов из их самых успешных видео),
-            "tone_of_voice": "String на русском. Постоянный аудио/вербальный стиль",
-            "visual_signature": "String на русском. Постоянные визуальные элементы (цвета, скорость монтажа)",
-            "avg_pacing_wpm": Number,
-            "best_hooks": ["String на русском", "String на русском"] (Примеры успешных хуков, которые они использовали),
-            "weaknesses": "String на русском. Что улучшить на основе менее успешных видео (если есть)"
-        }}
+
+        {PROFILE_OUTPUT_FORMAT}
+        """
+
+        self._save_profile(user, system_instruction, digest, videos[-1].id, 0, session)
+
+    def _incremental_update(self, user: UserProfile, new_videos: List[VideoAnalysis], session: Session):
+        logger.info(f"Merging {len(new_videos)} new videos into Master Profile of {user.username}.")
+        digest = self._merge_into_digest(user.style_digest, new_videos)
+        new_summary = [self._video_summary(v) for v in new_videos]
+
+        system_instruction = f"""
+        {PROFILE_LANGUAGE_RULES}
+
+        You are an expert AI Analyst specializing in Creator Economy.
+        Your task is to update the existing "Master Style DNA" (UserProfile) of a creator with their newly analyzed videos.
+
+        Creator: {user.username}
+        Current Master Style DNA: {json.dumps(user.master_profile, indent=2, ensure_ascii=False)}
+        Style Digest (totals and best performing videos, new videos included): {json.dumps(digest, indent=2, ensure_ascii=False)}
+        New Videos: {json.dumps(new_summary, indent=2, ensure_ascii=False)}
+
+        Keep what the new videos confirm, revise what they contradict and add new consistent patterns.
+        Weigh the new videos by their views relative to the creator's average.
+
+        {PROFILE_OUTPUT_FORMAT}
+        """
+
+        self._save_profile(user, system_instruction, digest, new_videos[-1].id, user.profile_updates + 1, session)
+
+    def _save_profile(
+        self,
+        user: UserProfile,
+        system_instruction: str,
+        digest: dict,
+        last_video_id: int,
+        profile_updates: int,
+        session: Session
+    ) -> bool:
+        """
+        Synthesizes and stores the profile. The write is a compare-and-swap on profile_version:
+        if another rebuild (a background one, /refresh or another worker process) saved a profile
+        while this one was waiting for Gemini, the newer profile is kept and this result is dropped.
+        Videos only this result covered are newer than the kept profile, so the next update merges them.
         """
-        
-        # Retry logic for 429 errors
-        max_attempts = 2
-        for attempt in range(max_attempts):
-            try:
-                response = self.model.generate_content(system_instruction)
-                response_text = response.text.strip()
-                
-                # Cleanup markdown if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-
-                master_profile_json = json.loads(response_text)
-                
-                user.master_profile = master_profile_json
-                user.last_updated = datetime.utcnow()
-                session.add(user)
-                session.commit()
-                logger.info(f"Master Profile updated for {user.username}: {master_profile_json.get('core_identity')}")
-                return
-                
-            except Exception as e:
-                error_str = str(e)
-                is_rate_limit = "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower()
-                
-                if is_rate_limit and attempt < max_attempts - 1:
-                    logger.warning(f"Gemini API 429 error (attempt {attempt + 1}/{max_attempts}). Retrying in 10s...")
-                    time.sleep(10)
-                    continue
-                else:
-                    logger.error(f"Failed to synthesize profile: {e}", exc_info=True)
-                    return
+        expected_version = user.profile_version
+        try:
+            response = self.llm.generate(system_instruction)
+            master_profile_json = parse_json_response(response.text)
+
+            result = session.exec(
+                update(UserProfile)
+                .where(UserProfile.id == user.id, UserProfile.profile_version == expected_version)
+                .values(
+                    master_profile=master_profile_json,
+                    style_digest=digest,
+                    profile_video_id=last_video_id,
+                    profile_updates=profile_updates,
+                    profile_version=expected_version + 1,
+                    last_updated=datetime.utcnow()
+                )
+            )
+            session.commit()
+            session.refresh(user)
+            if not result.rowcount:
+                logger.warning(f"Master Profile of {user.username} was updated concurrently, keeping the newer one")
+                return False
+            logger.info(f"Master Profile updated for {user.username}: {master_profile_json.get('core_identity')}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to synthesize profile: {e}", exc_info=True)
+            return False
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import UserProfile, VideoAnalysis
+from app.services.profile_builder import ProfileBuilderService
+
+logger = logging.getLogger(__name__)
+
+class ProfileRebuildScheduler:
+    """
+    Debounced background Master Profile updates.
+
+    schedule(user_id) returns immediately. Requests for the same user within PROFILE_REBUILD_DEBOUNCE
+    seconds are coalesced into a single rebuild, which is delayed by at most PROFILE_REBUILD_MAX_DELAY
+    under continuous traffic. Rebuilds of one user never overlap within this scheduler; a concurrent
+    /refresh or another worker process can't overwrite a newer profile either, because profiles are
+    saved with a compare-and-swap on profile_version. Nothing is lost if a pending rebuild is dropped:
+    the next one merges every video newer than the profile.
+    """
+    def __init__(
+        self,
+        profile_builder_factory: Callable[[], ProfileBuilderService],
+        debounce: Optional[float] = None,
+        max_delay: Optional[float] = None
+    ):
+        self.profile_builder_factory = profile_builder_factory
+        self.debounce = settings.PROFILE_REBUILD_DEBOUNCE if debounce is None else debounce
+        self.max_delay = settings.PROFILE_REBUILD_MAX_DELAY if max_delay is None else max_delay
+        self._executor = ThreadPoolExecutor(max_workers=settings.PROFILE_REBUILD_WORKERS, thread_name_prefix="profile-rebuild")
+        self._lock = threading.Lock()
+        self._timers = {}  # user_id -> (timer, first requested at)
+        self._running = set()
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+
+    def schedule(self, user_id: int):
+        """Request a profile rebuild for `user_id`."""
+        with self._lock:
+            now = time.monotonic()
+            first_requested = now
+            pending = self._timers.get(user_id)
+            if pending:
+                timer, first_requested = pending
+                timer.cancel()
+                self.coalesced += 1
+            delay = max(0.0, min(self.debounce, first_requested + self.max_delay - now))
+            timer = threading.Timer(delay, self._fire, args=(user_id,))
+            timer.daemon = True
+            self._timers[user_id] = (timer, first_requested)
+            timer.start()
+        logger.info(f"Profile rebuild for user {user_id} scheduled in {delay:.1f}s")
+
+    def _fire(self, user_id: int):
+        with self._lock:
+            self._timers.pop(user_id, None)
+            if user_id in self._running:
+                # Picked up again once the running rebuild is finished
+                reschedule = True
+            else:
+                reschedule = False
+                self._running.add(user_id)
+        if reschedule:
+            self.schedule(user_id)
+            return
+        self._executor.submit(self._rebuild, user_id)
+
+    def _rebuild(self, user_id: int):
+        start_time = time.time()
+        try:
+            with Session(engine) as session:
+                self.profile_builder_factory().update_master_profile(user_id, session)
+            self.completed += 1
+            logger.info(f"Profile rebuild for user {user_id} finished in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Profile rebuild for user {user_id} failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+
+    def schedule_stale(self):
+        """Called on startup: schedules users with videos that aren't merged into their profile yet."""
+        with Session(engine) as session:
+            newest_video = func.max(VideoAnalysis.id)
+            user_ids = session.exec(
+                select(UserProfile.id)
+                .join(VideoAnalysis, VideoAnalysis.user_id == UserProfile.id)
+                .group_by(UserProfile.id, UserProfile.profile_video_id)
+                .having(newest_video > func.coalesce(UserProfile.profile_video_id, 0))
+            ).all()
+        for user_id in user_ids:
+            self.schedule(user_id)
+        if user_ids:
+            logger.info(f"Scheduled {len(user_ids)} outdated profiles for rebuild")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._timers),
+                "running": len(self._running),
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "failed": self.failed
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for timer, _ in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
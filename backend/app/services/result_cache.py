@@ -0,0 +1,60 @@
+import logging
+from typing import Optional
+from sqlmodel import Session, delete
+
+from app.models import AnalysisResultCache
+from app.services.analyzer import analysis_pipeline_version
+
+logger = logging.getLogger(__name__)
+
+class AnalysisResultCacheService:
+    """
+    Finished analyses keyed by (platform, platform video id, pipeline version).
+    The version changes with the analyzer prompt/model and frame settings, so stale entries simply stop matching.
+    """
+    def __init__(self):
+        self.version = analysis_pipeline_version()
+
+    def make_key(self, platform: str, platform_video_id: str) -> str:
+        return f"{platform}:{platform_video_id}:{self.version}"
+
+    def get(self, session: Session, platform: str, platform_video_id: str) -> Optional[AnalysisResultCache]:
+        entry = session.get(AnalysisResultCache, self.make_key(platform, platform_video_id))
+        if entry:
+            logger.info(f"Analysis cache hit for {platform}:{platform_video_id}")
+        return entry
+
+    def put(
+        self,
+        session: Session,
+        platform: str,
+        platform_video_id: str,
+        transcript: dict,
+        passport: dict,
+        stats: dict,
+        paths: dict
+    ) -> AnalysisResultCache:
+        entry = AnalysisResultCache(
+            key=self.make_key(platform, platform_video_id),
+            platform=platform,
+            platform_video_id=platform_video_id,
+            pipeline_version=self.version,
+            transcript=transcript,
+            passport=passport,
+            stats=stats,
+            paths=paths
+        )
+        entry = session.merge(entry)
+        session.commit()
+        logger.info(f"Stored analysis cache entry {entry.key}")
+        return entry
+
+    def purge_stale(self, session: Session) -> int:
+        """Delete entries produced by another pipeline version. Returns number of removed rows."""
+        result = session.exec(
+            delete(AnalysisResultCache).where(AnalysisResultCache.pipeline_version != self.version)
+        )
+        session.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} stale analysis cache entries")
+        return result.rowcount
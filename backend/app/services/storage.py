@@ -0,0 +1,169 @@
+import logging
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+from sqlalchemy import func
+from sqlmodel import Session, select, delete
+
+from app.core.config import settings
+from app.models import StoredArtifact
+
+logger = logging.getLogger(__name__)
+
+class StorageManager:
+    """
+    Keeps TEMP_DIR within STORAGE_BUDGET_MB.
+
+    Every file or directory the pipeline produces is recorded in the StoredArtifact table
+    with its size and last access time, so the total size and the eviction order come from
+    the DB instead of a directory walk. Eviction removes whole videos, least recently used first,
+    and skips videos pinned by a job in this process or used by any process within
+    STORAGE_MIN_IDLE_SECONDS.
+    """
+    # video_id -> number of running jobs in this process using it
+    _pins = {}
+    _pins_lock = threading.Lock()
+    _evict_lock = threading.Lock()
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or settings.TEMP_DIR
+        self.budget_bytes = settings.STORAGE_BUDGET_MB * 1024 * 1024
+
+    @contextmanager
+    def pin(self, video_id: str):
+        """Artifacts of `video_id` are not evicted while in the block."""
+        with self._pins_lock:
+            self._pins[video_id] = self._pins.get(video_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._pins_lock:
+                if self._pins[video_id] == 1:
+                    del self._pins[video_id]
+                else:
+                    self._pins[video_id] -= 1
+
+    def _relative(self, path: Path) -> str:
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def _size(self, path: Path) -> int:
+        if path.is_dir():
+            return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+        return path.stat().st_size if path.exists() else 0
+
+    def register(self, session: Session, video_id: str, path: Optional[Path], kind: str):
+        """Records (or refreshes) an artifact and marks it as just used."""
+        if not path or not Path(path).exists():
+            return
+        key = self._relative(path)
+        artifact = session.get(StoredArtifact, key)
+        if artifact:
+            artifact.size_bytes = self._size(Path(path))
+            artifact.last_access = datetime.utcnow()
+        else:
+            artifact = StoredArtifact(path=key, video_id=video_id, kind=kind, size_bytes=self._size(Path(path)))
+        session.add(artifact)
+        session.commit()
+
+    def total_bytes(self, session: Session) -> int:
+        return session.exec(select(func.coalesce(func.sum(StoredArtifact.size_bytes), 0))).one()
+
+    def enforce_budget(self, session: Session) -> int:
+        """Evicts least recently used videos until TEMP_DIR fits the budget. Returns freed bytes."""
+        if self.budget_bytes <= 0:
+            return 0
+
+        with self._evict_lock:
+            total = self.total_bytes(session)
+            if total <= self.budget_bytes:
+                return 0
+
+            idle_since = datetime.utcnow() - timedelta(seconds=settings.STORAGE_MIN_IDLE_SECONDS)
+            last_access = func.max(StoredArtifact.last_access)
+            candidates = session.exec(
+                select(StoredArtifact.video_id, func.sum(StoredArtifact.size_bytes))
+                .group_by(StoredArtifact.video_id)
+                .having(last_access < idle_since)
+                .order_by(last_access)
+            ).all()
+
+            freed = 0
+            for video_id, size in candidates:
+                if total - freed <= self.budget_bytes:
+                    break
+                with self._pins_lock:
+                    if video_id in self._pins:
+                        continue
+                freed += self._evict_video(session, video_id)
+
+            logger.info(f"Storage: freed {freed} bytes, {total - freed} of {self.budget_bytes} bytes used")
+            if total - freed > self.budget_bytes:
+                logger.warning("Storage budget still exceeded, remaining artifacts are in use")
+            return freed
+
+    def _evict_video(self, session: Session, video_id: str) -> int:
+        artifacts = session.exec(select(StoredArtifact).where(StoredArtifact.video_id == video_id)).all()
+        freed = 0
+        for artifact in artifacts:
+            path = self.root / artifact.path
+            try:
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            except FileNotFoundError:
+                pass  # Already removed by another process
+            except OSError as e:
+                logger.warning(f"Failed to evict {path}: {e}")
+                continue
+            freed += artifact.size_bytes
+            session.delete(artifact)
+        session.commit()
+        logger.info(f"Evicted video {video_id} from storage ({freed} bytes)")
+        return freed
+
+    def adopt_untracked(self, session: Session) -> int:
+        """
+        One-time scan for artifacts left by versions without tracking, so they can be evicted too.
+        Records missing from disk are dropped. Returns the number of adopted artifacts.
+        """
+        tracked = set(session.exec(select(StoredArtifact.path)).all())
+        on_disk = set()
+        adopted = 0
+
+        entries = [p for p in self.root.iterdir() if p.is_file()]
+        frames_root = self.root / "frames"
+        if frames_root.is_dir():
+            entries += [p for p in frames_root.iterdir() if p.is_dir()]
+
+        for path in entries:
+            if path.name.startswith(".") or path.suffix in ('.part', '.ytdl', '.temp'):
+                continue
+            key = self._relative(path)
+            on_disk.add(key)
+            if key in tracked:
+                continue
+            if path.parent == frames_root:
+                video_id, kind = path.name, "frames"
+            else:
+                video_id = path.name.split(".", 1)[0]
+                kind = "audio" if path.suffix == ".mp3" or ".analysis-audio." in path.name else "video"
+            session.add(StoredArtifact(
+                path=key,
+                video_id=video_id,
+                kind=kind,
+                size_bytes=self._size(path),
+                last_access=datetime.utcfromtimestamp(path.stat().st_mtime)
+            ))
+            adopted += 1
+
+        missing = tracked - on_disk
+        if missing:
+            session.exec(delete(StoredArtifact).where(StoredArtifact.path.in_(missing)))
+        session.commit()
+        if adopted or missing:
+            logger.info(f"Storage: adopted {adopted} untracked artifacts, dropped {len(missing)} missing ones")
+        return adopted
@@ -1,37 +1,116 @@
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 from pathlib import Path
+from typing import Union
+import numpy as np
 import os
 import logging
+import threading
 import time
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class TranscriberService:
     def __init__(self):
-        self.model_size = "small"
-        logger.info(f"Loading faster-whisper model: {self.model_size}")
+        self.model_size = settings.WHISPER_MODEL_SIZE
+        self.num_workers = max(settings.WHISPER_NUM_WORKERS, 1)
+        # Pin threads so parallel workers don't oversubscribe the cores
+        self.cpu_threads = settings.WHISPER_CPU_THREADS or max((os.cpu_count() or 1) // self.num_workers, 1)
+        self.batch_size = settings.WHISPER_BATCH_SIZE
+        logger.info(
+            f"Loading faster-whisper model: {self.model_size} "
+            f"({self.num_workers} workers x {self.cpu_threads} threads, batch size {self.batch_size or 'off'})"
+        )
         
         try:
             # Run on CPU as requested.
             # compute_type="int8" is usually efficient for CPU.
-            self.model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
+            # num_workers lets that many transcribe() calls run concurrently on one loaded model.
+            self.model = WhisperModel(
+                self.model_size,
+                device="cpu",
+                compute_type="int8",
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers
+            )
+            self.batched_model = BatchedInferencePipeline(model=self.model) if self.batch_size > 0 else None
             logger.info("Model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading WhisperModel: {e}")
             raise e
 
-    def transcribe(self, audio_path: Path):
+        # Admission to the model workers; requests beyond num_workers wait here
+        self._slots = threading.BoundedSemaphore(self.num_workers)
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._audio_seconds = 0.0
+
+    def stats(self) -> dict:
+        """Queue depth and throughput counters of the transcription pool."""
+        with self._stats_lock:
+            return {
+                "model": self.model_size,
+                "workers": self.num_workers,
+                "cpu_threads": self.cpu_threads,
+                "batch_size": self.batch_size,
+                "queue_depth": self._waiting,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "busy_seconds": round(self._busy_seconds, 2),
+                "audio_seconds": round(self._audio_seconds, 2),
+            }
+
+    def transcribe(self, audio: Union[Path, np.ndarray]):
         """
-        Transcribes audio file using faster-whisper.
+        Transcribes an audio file, or 16 kHz mono float32 PCM already in memory, using faster-whisper.
         Returns tuple (full_text, segments_list).
         """
-        if not audio_path.exists():
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        if isinstance(audio, Path) and not audio.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio}")
+
+        with self._stats_lock:
+            self._waiting += 1
+        self._slots.acquire()
+        with self._stats_lock:
+            self._waiting -= 1
+            self._active += 1
+
+        start_time = time.time()
+        try:
+            result = self._transcribe(audio)
+        except Exception:
+            with self._stats_lock:
+                self._failed += 1
+            raise
+        finally:
+            duration = time.time() - start_time
+            with self._stats_lock:
+                self._active -= 1
+                self._busy_seconds += duration
+            self._slots.release()
+
+        with self._stats_lock:
+            self._completed += 1
+            self._audio_seconds += result.pop("audio_duration", 0.0) or 0.0
+        return result
 
-        logger.info(f"Starting transcription for {audio_path}")
+    def _transcribe(self, audio: Union[Path, np.ndarray]) -> dict:
+        if isinstance(audio, Path):
+            logger.info(f"Starting transcription for {audio}")
+            audio = str(audio)
+        else:
+            logger.info(f"Starting transcription of {len(audio) / 16000:.1f}s in-memory audio")
         start_time = time.time()
         
-        segments, info = self.model.transcribe(str(audio_path), beam_size=5)
+        if self.batched_model:
+            segments, info = self.batched_model.transcribe(audio, beam_size=5, batch_size=self.batch_size)
+        else:
+            segments, info = self.model.transcribe(audio, beam_size=5)
 
         logger.info(f"Detected language '{info.language}' with probability {info.language_probability}")
 
@@ -59,5 +138,6 @@ class TranscriberService:
             "text": full_text,
             "segments": segment_list,
             "language": info.language,
-            "language_probability": info.language_probability
+            "language_probability": info.language_probability,
+            "audio_duration": getattr(info, "duration", 0.0)
         }
@@ -0,0 +1,43 @@
+import json
+import logging
+import zlib
+from typing import List, Optional
+from sqlmodel import Session, select
+
+from app.models import VideoTranscript
+
+logger = logging.getLogger(__name__)
+
+class TranscriptStore:
+    """
+    Keeps Whisper output per analyzed video, so it can be served again without re-transcribing.
+    Segments are stored as a zlib-compressed JSON blob.
+    """
+    def save(self, session: Session, video_id: int, text: str, segments: List[dict], language: Optional[str] = None) -> VideoTranscript:
+        """Create or replace the transcript of a video."""
+        transcript = session.exec(select(VideoTranscript).where(VideoTranscript.video_id == video_id)).first()
+        if not transcript:
+            transcript = VideoTranscript(video_id=video_id)
+
+        transcript.text = text
+        transcript.language = language
+        transcript.segments_blob = zlib.compress(
+            json.dumps(segments, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+        session.add(transcript)
+        session.commit()
+        logger.info(f"Saved transcript for video {video_id} ({len(text)} chars, {len(segments)} segments)")
+        return transcript
+
+    def get(self, session: Session, video_id: int) -> Optional[dict]:
+        """Returns {"text", "segments", "language"} or None if nothing is stored."""
+        transcript = session.exec(select(VideoTranscript).where(VideoTranscript.video_id == video_id)).first()
+        if not transcript:
+            return None
+
+        segments = json.loads(zlib.decompress(transcript.segments_blob).decode("utf-8")) if transcript.segments_blob else []
+        return {
+            "text": transcript.text,
+            "segments": segments,
+            "language": transcript.language
+        }
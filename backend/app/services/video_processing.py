@@ -1,12 +1,36 @@
 import ffmpeg
 import os
+import io
 import logging
+import subprocess
+import threading
+import numpy as np
+from PIL import Image
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class VideoProcessingService:
+    def _prepare_frames_dir(self, video_id: str) -> Path:
+        """
+        Returns temp/frames/{video_id}/, created and emptied of frames from a previous run.
+        """
+        frames_dir = settings.TEMP_DIR / "frames" / video_id
+        
+        # Clean up old frames if directory exists
+        if frames_dir.exists():
+            logger.info(f"Cleaning up old frames in {frames_dir}")
+            for old_frame in frames_dir.glob("*.jpg"):
+                try:
+                    old_frame.unlink()
+                except Exception as e:
+                    logger.warning(f"Failed to delete old frame {old_frame}: {e}")
+        
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        return frames_dir
+
     def extract_audio(self, video_path: Path, video_id: str) -> Path:
         """
         Extracts audio from video and saves as MP3.
@@ -36,18 +60,7 @@ class VideoProcessingService:
         Saves them to temp/frames/{video_id}/.
         Returns path to the frames directory.
         """
-        frames_dir = settings.TEMP_DIR / "frames" / video_id
-        
-        # Clean up old frames if directory exists
-        if frames_dir.exists():
-            logger.info(f"Cleaning up old frames in {frames_dir}")
-            for old_frame in frames_dir.glob("*.jpg"):
-                try:
-                    old_frame.unlink()
-                except Exception as e:
-                    logger.warning(f"Failed to delete old frame {old_frame}: {e}")
-        
-        frames_dir.mkdir(parents=True, exist_ok=True)
+        frames_dir = self._prepare_frames_dir(video_id)
         
         output_pattern = str(frames_dir / "frame_%04d.jpg")
         logger.info(f"Extracting frames to {frames_dir} every {interval}s")
@@ -66,3 +79,377 @@ class VideoProcessingService:
             error_msg = e.stderr.decode('utf8')
             logger.error(f"FFmpeg error extracting frames: {error_msg}")
             raise Exception(f"FFmpeg error extracting frames: {error_msg}")
+
+    def extract_media(self, video_path: Path, video_id: str, interval: int = 2, audio_source: Optional[Path] = None) -> Tuple[Path, Path]:
+        """
+        Extracts the MP3 audio track and frames every `interval` seconds in a single ffmpeg run,
+        so the input is demuxed and decoded once instead of once per output.
+        `audio_source` is the separately downloaded audio stream, if any.
+        Returns (audio_path, frames_dir), same paths as extract_audio / extract_frames.
+        """
+        audio_path = settings.TEMP_DIR / f"{video_id}.mp3"
+        frames_dir = self._prepare_frames_dir(video_id)
+        output_pattern = str(frames_dir / "frame_%04d.jpg")
+        logger.info(f"Extracting audio to {audio_path} and frames to {frames_dir} every {interval}s (single pass)")
+        
+        try:
+            source = ffmpeg.input(str(video_path))
+            audio_input = ffmpeg.input(str(audio_source)) if audio_source and audio_source != video_path else source
+            audio_output = audio_input.audio.output(str(audio_path), acodec='libmp3lame', **{'q:a': 2})
+            frames_output = source.video.filter('fps', fps=f"1/{interval}").output(output_pattern, **{'q:v': 2})
+            (
+                ffmpeg
+                .merge_outputs(audio_output, frames_output)
+                .global_args('-loglevel', 'error')
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            logger.info("Combined audio/frame extraction completed")
+            return audio_path, frames_dir
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode('utf8')
+            logger.error(f"FFmpeg error extracting media: {error_msg}")
+            raise Exception(f"FFmpeg error extracting media: {error_msg}")
+
+    def extract_keyframes(
+        self,
+        video_path: Path,
+        video_id: str,
+        max_frames: int = 3,
+        timestamps: Optional[List[float]] = None,
+        duration: Optional[float] = None,
+        scene_threshold: float = 0.0,
+        max_size: int = 512
+    ) -> Path:
+        """
+        Extracts only the frames the analyzer will use, already scaled to fit `max_size`.
+        
+        By default seeks to `max_frames` evenly spaced timestamps (first, ..., last) and decodes
+        only the nearest keyframe at each point. With `scene_threshold` > 0 it instead keeps
+        the first keyframe plus keyframes whose scene-change score exceeds the threshold.
+        Saves frames to temp/frames/{video_id}/ and returns that directory.
+        """
+        frames_dir = self._prepare_frames_dir(video_id)
+        scale_args = dict(w=max_size, h=max_size, force_original_aspect_ratio='decrease')
+        
+        try:
+            if scene_threshold > 0:
+                logger.info(f"Extracting up to {max_frames} scene-change keyframes (threshold {scene_threshold}) to {frames_dir}")
+                (
+                    ffmpeg
+                    .input(str(video_path), skip_frame='nokey')
+                    .video
+                    .filter('select', f"eq(n,0)+gt(scene,{scene_threshold})")
+                    .filter('scale', **scale_args)
+                    .output(str(frames_dir / "frame_%04d.jpg"), vsync='vfr', vframes=max_frames, **{'q:v': 2})
+                    .global_args('-loglevel', 'error')
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+            else:
+                if timestamps is None:
+                    timestamps = self._spread_timestamps(video_path, max_frames, duration)
+                logger.info(f"Extracting {len(timestamps)} keyframes at {[round(t, 2) for t in timestamps]}s to {frames_dir}")
+                
+                targets = {frames_dir / f"frame_{index:04d}.jpg": timestamp for index, timestamp in enumerate(timestamps, start=1)}
+                self._grab_frames(video_path, targets, scale_args, keyframes_only=True)
+                
+                # Keyframe-only decoding yields nothing when the seek lands in the last GOP,
+                # fall back to a regular decode for those points
+                missing = {path: timestamp for path, timestamp in targets.items() if not path.exists()}
+                if missing:
+                    logger.info(f"No keyframe found near {sorted(missing.values())}s, decoding nearest frames instead")
+                    self._grab_frames(video_path, missing, scale_args, keyframes_only=False)
+            
+            logger.info(f"Keyframe extraction completed: {len(list(frames_dir.glob('*.jpg')))} frames")
+            return frames_dir
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode('utf8')
+            logger.error(f"FFmpeg error extracting keyframes: {error_msg}")
+            raise Exception(f"FFmpeg error extracting keyframes: {error_msg}")
+
+    def _grab_frames(self, video_path: Path, targets: Dict[Path, float], scale_args: dict, keyframes_only: bool):
+        """
+        Writes one scaled frame per (output path, timestamp) in a single ffmpeg run.
+        Every timestamp gets its own input, so each one is seeked to directly.
+        """
+        input_args = dict(skip_frame='nokey', noaccurate_seek=None) if keyframes_only else {}
+        outputs = [
+            ffmpeg
+            .input(str(video_path), ss=timestamp, **input_args)
+            .video
+            .filter('scale', **scale_args)
+            .output(str(path), vframes=1, update=1, **{'q:v': 2})
+            for path, timestamp in targets.items()
+        ]
+        (
+            ffmpeg
+            .merge_outputs(*outputs)
+            .global_args('-loglevel', 'error')
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+
+    def _spread_timestamps(self, video_path: Path, count: int, duration: Optional[float] = None) -> List[float]:
+        """
+        Evenly spaced timestamps from the start to the end of the video.
+        Uses ffprobe when the duration is not known from the download metadata.
+        """
+        if not duration:
+            try:
+                duration = float(ffmpeg.probe(str(video_path))["format"]["duration"])
+            except (ffmpeg.Error, KeyError, ValueError) as e:
+                logger.warning(f"Could not probe duration of {video_path}: {e}")
+                duration = 0.0
+        
+        # Stay clear of the very end, where there may be no keyframe left to seek to
+        last = max(duration - 1.0, 0.0)
+        if count <= 1 or last == 0:
+            return [0.0]
+        return [last * i / (count - 1) for i in range(count)]
+
+    # In-memory variants: ffmpeg writes to stdout and nothing touches the disk
+
+    def load_audio_pcm(self, source_path: Path, sample_rate: int = 16000) -> np.ndarray:
+        """
+        Decodes the audio track to 16 kHz mono float32 PCM, the input format Whisper works on.
+        Skips the lossy MP3 encode/decode round trip of extract_audio.
+        """
+        logger.info(f"Decoding audio from {source_path} to PCM in memory")
+        try:
+            out, _ = (
+                ffmpeg
+                .input(str(source_path))
+                .audio
+                .output('pipe:', format='f32le', acodec='pcm_f32le', ac=1, ar=sample_rate)
+                .global_args('-loglevel', 'error')
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            audio = np.frombuffer(out, np.float32)
+            logger.info(f"Decoded {len(audio) / sample_rate:.1f}s of audio ({len(out)} bytes)")
+            return audio
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode('utf8')
+            logger.error(f"FFmpeg error decoding audio: {error_msg}")
+            raise Exception(f"FFmpeg error decoding audio: {error_msg}")
+
+    def load_frames(self, video_path: Path, interval: int = 2, max_size: int = 512) -> List[Image.Image]:
+        """
+        In-memory counterpart of extract_frames: a frame every `interval` seconds
+        streamed through image2pipe, scaled to fit `max_size`.
+        """
+        logger.info(f"Streaming frames from {video_path} every {interval}s")
+        stream = (
+            ffmpeg
+            .input(str(video_path))
+            .video
+            .filter('fps', fps=f"1/{interval}")
+            .filter('scale', w=max_size, h=max_size, force_original_aspect_ratio='decrease')
+        )
+        return self._run_frame_pipe(stream)
+
+    def load_media(
+        self,
+        video_path: Path,
+        interval: int = 2,
+        max_size: int = 512,
+        audio_source: Optional[Path] = None,
+        sample_rate: int = 16000
+    ) -> Tuple[np.ndarray, List[Image.Image]]:
+        """
+        In-memory counterpart of extract_media: PCM audio (as load_audio_pcm) and a frame every
+        `interval` seconds (as load_frames) from a single ffmpeg run. Audio goes to stdout,
+        the frames to an extra pipe, so the video is still decoded only once.
+        """
+        if os.name == "nt":
+            # No way to hand ffmpeg an extra pipe there, fall back to two passes
+            logger.info("Single-pass in-memory extraction is not supported on Windows, decoding audio and frames separately")
+            return (
+                self.load_audio_pcm(audio_source or video_path, sample_rate=sample_rate),
+                self.load_frames(video_path, interval=interval, max_size=max_size)
+            )
+
+        logger.info(f"Streaming PCM audio and frames every {interval}s from {video_path} (single pass)")
+        source = ffmpeg.input(str(video_path))
+        audio_input = ffmpeg.input(str(audio_source)) if audio_source and audio_source != video_path else source
+        read_fd, write_fd = os.pipe()
+        try:
+            audio_output = audio_input.audio.output('pipe:', format='f32le', acodec='pcm_f32le', ac=1, ar=sample_rate)
+            frames_output = (
+                source
+                .video
+                .filter('fps', fps=f"1/{interval}")
+                .filter('scale', w=max_size, h=max_size, force_original_aspect_ratio='decrease')
+                .output(f'pipe:{write_fd}', format='image2pipe', vcodec='mjpeg', vsync='vfr', **{'q:v': 2})
+            )
+            args = ffmpeg.merge_outputs(audio_output, frames_output).global_args('-loglevel', 'error').compile()
+            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=(write_fd,))
+        except Exception:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+
+        # Both pipes have to be drained at once, or ffmpeg blocks on whichever fills up first
+        chunks = []
+        def read_frames():
+            with os.fdopen(read_fd, 'rb') as frames_pipe:
+                chunks.append(frames_pipe.read())
+        reader = threading.Thread(target=read_frames, daemon=True)
+        reader.start()
+        out, err = process.communicate()
+        reader.join()
+
+        if process.returncode != 0:
+            error_msg = err.decode('utf8')
+            logger.error(f"FFmpeg error streaming media: {error_msg}")
+            raise Exception(f"FFmpeg error streaming media: {error_msg}")
+
+        audio = np.frombuffer(out, np.float32)
+        images = self._split_jpegs(chunks[0] if chunks else b"")
+        logger.info(f"Decoded {len(audio) / sample_rate:.1f}s of audio and {len(images)} frames in one pass")
+        return audio, images
+
+    def load_keyframes(
+        self,
+        video_path: Path,
+        max_frames: int = 3,
+        timestamps: Optional[List[float]] = None,
+        duration: Optional[float] = None,
+        scene_threshold: float = 0.0,
+        max_size: int = 512
+    ) -> List[Image.Image]:
+        """
+        In-memory counterpart of extract_keyframes, returns PIL images instead of a frames directory.
+        """
+        scale_args = dict(w=max_size, h=max_size, force_original_aspect_ratio='decrease')
+        
+        if scene_threshold > 0:
+            logger.info(f"Streaming up to {max_frames} scene-change keyframes (threshold {scene_threshold})")
+            stream = (
+                ffmpeg
+                .input(str(video_path), skip_frame='nokey')
+                .video
+                .filter('select', f"eq(n,0)+gt(scene,{scene_threshold})")
+                .filter('scale', **scale_args)
+            )
+            return self._run_frame_pipe(stream, max_frames=max_frames)
+        
+        if timestamps is None:
+            timestamps = self._spread_timestamps(video_path, max_frames, duration)
+        logger.info(f"Streaming {len(timestamps)} keyframes at {[round(t, 2) for t in timestamps]}s")
+        
+        images = self._grab_images(video_path, timestamps, scale_args, keyframes_only=True)
+        # Same last-GOP fallback as extract_keyframes
+        missing = [index for index, image in enumerate(images) if image is None]
+        if missing:
+            logger.info(f"No keyframe found near {[round(timestamps[index], 2) for index in missing]}s, decoding nearest frames instead")
+            fallback = self._grab_images(video_path, [timestamps[index] for index in missing], scale_args, keyframes_only=False)
+            for index, image in zip(missing, fallback):
+                images[index] = image
+        return [image for image in images if image is not None]
+
+    def _grab_images(self, video_path: Path, timestamps: List[float], scale_args: dict, keyframes_only: bool) -> List[Optional[Image.Image]]:
+        """
+        In-memory counterpart of _grab_frames: one frame per timestamp from a single ffmpeg run.
+        Every timestamp gets its own input and its own output pipe, so a point that yields
+        no frame is still told apart (None in the result).
+        """
+        if os.name == "nt":
+            # No way to hand ffmpeg extra pipes there, fall back to a run per timestamp
+            images = []
+            for timestamp in timestamps:
+                frames = self._run_frame_pipe(self._seek_stream(video_path, timestamp, scale_args, keyframes_only), max_frames=1)
+                images.append(frames[0] if frames else None)
+            return images
+
+        pipes = []
+        try:
+            for _ in timestamps:
+                pipes.append(os.pipe())
+            outputs = [
+                self._seek_stream(video_path, timestamp, scale_args, keyframes_only)
+                .output(f'pipe:{write_fd}', format='image2pipe', vcodec='mjpeg', vframes=1, **{'q:v': 2})
+                for timestamp, (_, write_fd) in zip(timestamps, pipes)
+            ]
+            args = ffmpeg.merge_outputs(*outputs).global_args('-loglevel', 'error').compile()
+            process = subprocess.Popen(
+                args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, pass_fds=[write_fd for _, write_fd in pipes]
+            )
+        except Exception:
+            for read_fd, _ in pipes:
+                os.close(read_fd)
+            raise
+        finally:
+            for _, write_fd in pipes:
+                os.close(write_fd)
+
+        # Every pipe has to be drained at once, or ffmpeg blocks on whichever fills up first
+        chunks = [b""] * len(pipes)
+        def read_frame(index: int, read_fd: int):
+            with os.fdopen(read_fd, 'rb') as frame_pipe:
+                chunks[index] = frame_pipe.read()
+        readers = [
+            threading.Thread(target=read_frame, args=(index, read_fd), daemon=True)
+            for index, (read_fd, _) in enumerate(pipes)
+        ]
+        for reader in readers:
+            reader.start()
+        _, err = process.communicate()
+        for reader in readers:
+            reader.join()
+
+        if process.returncode != 0:
+            error_msg = err.decode('utf8')
+            logger.error(f"FFmpeg error streaming frames: {error_msg}")
+            raise Exception(f"FFmpeg error streaming frames: {error_msg}")
+
+        images = []
+        for chunk in chunks:
+            frames = self._split_jpegs(chunk)
+            images.append(frames[0] if frames else None)
+        logger.info(f"Streamed {sum(image is not None for image in images)}/{len(timestamps)} frames in one pass")
+        return images
+
+    def _seek_stream(self, video_path: Path, timestamp: float, scale_args: dict, keyframes_only: bool):
+        input_args = dict(skip_frame='nokey', noaccurate_seek=None) if keyframes_only else {}
+        return ffmpeg.input(str(video_path), ss=timestamp, **input_args).video.filter('scale', **scale_args)
+
+    def _run_frame_pipe(self, stream, max_frames: Optional[int] = None) -> List[Image.Image]:
+        """Runs a video stream into image2pipe as MJPEG and splits stdout into PIL images."""
+        output_args = {'vsync': 'vfr', 'q:v': 2}
+        if max_frames:
+            output_args['vframes'] = max_frames
+        try:
+            out, _ = (
+                stream
+                .output('pipe:', format='image2pipe', vcodec='mjpeg', **output_args)
+                .global_args('-loglevel', 'error')
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode('utf8')
+            logger.error(f"FFmpeg error streaming frames: {error_msg}")
+            raise Exception(f"FFmpeg error streaming frames: {error_msg}")
+        
+        images = self._split_jpegs(out)
+        logger.info(f"Streamed {len(images)} frames ({len(out)} bytes)")
+        return images
+
+    def _split_jpegs(self, out: bytes) -> List[Image.Image]:
+        """Splits concatenated image2pipe MJPEG output into PIL images."""
+        # Each frame is a complete JPEG: SOI (FFD8) ... EOI (FFD9). 0xFF bytes inside the
+        # entropy-coded data are always stuffed, so the EOI marker can't appear mid-frame.
+        images = []
+        position = 0
+        while True:
+            start = out.find(b'\xff\xd8', position)
+            if start < 0:
+                break
+            end = out.find(b'\xff\xd9', start + 2)
+            if end < 0:
+                break
+            # Not decoded here: only the selected frames are, and then in JPEG draft mode
+            images.append(Image.open(io.BytesIO(out[start:end + 2])))
+            position = end + 2
+        return images
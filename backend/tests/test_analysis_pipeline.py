@@ -0,0 +1,13 @@
+from app.services.analysis_pipeline import AnalysisPipeline
+
+def test_cached_paths_of_deleted_artifacts_are_blanked(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+
+    paths = AnalysisPipeline._existing_paths({
+        "video": str(video),
+        "audio": str(tmp_path / "evicted.wav"),
+        "frames": ""
+    })
+
+    assert paths == {"video": str(video), "audio": "", "frames": ""}
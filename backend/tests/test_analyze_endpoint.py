@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine
+
+from app.api import endpoints
+from app.core.executors import ExecutorOverloaded
+
+CACHED_RESULT = {
+    "status": "success",
+    "video_id": 1,
+    "username": "creator",
+    "transcript_text": "hello",
+    "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}],
+    "paths": {"video": "", "audio": "", "frames": ""},
+    "style_passport": {"hook_analysis": "..."},
+    "meta_stats": {"view_count": 10},
+    "timings": {"cache_hit": True},
+}
+
+class FakePipeline:
+    def __init__(self, cached):
+        self.cached = cached
+        self.cache_lookups = 0
+
+    def run_cached(self, url, session, current_user_id=None, update_profile=True):
+        self.cache_lookups += 1
+        return self.cached
+
+class OverloadedExecutor:
+    def try_submit(self, fn, *args, **kwargs):
+        raise ExecutorOverloaded("analyze", retry_after=7)
+
+def _client(monkeypatch, tmp_path, pipeline):
+    monkeypatch.setattr(endpoints, "engine", create_engine(f"sqlite:///{tmp_path / 'test.db'}"))
+    monkeypatch.setattr(endpoints, "get_executor", lambda name: OverloadedExecutor())
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.dependency_overrides[endpoints.get_analysis_pipeline] = lambda: pipeline
+    return TestClient(app)
+
+def test_cache_hits_skip_the_analyze_queue(monkeypatch, tmp_path):
+    pipeline = FakePipeline(CACHED_RESULT)
+    response = _client(monkeypatch, tmp_path, pipeline).post("/analyze", json={"url": "https://youtu.be/abc"})
+
+    assert response.status_code == 200
+    assert response.json()["timings"] == {"cache_hit": True}
+
+@pytest.mark.parametrize("body", [
+    {"url": "https://youtu.be/abc"},
+    {"url": "https://youtu.be/abc", "force": True},
+])
+def test_full_runs_are_rejected_when_the_queue_is_full(monkeypatch, tmp_path, body):
+    pipeline = FakePipeline(CACHED_RESULT if body.get("force") else None)
+    response = _client(monkeypatch, tmp_path, pipeline).post("/analyze", json=body)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert pipeline.cache_lookups == (0 if body.get("force") else 1)
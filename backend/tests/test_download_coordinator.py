@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.services.download_coordinator import DownloadCoordinator, DownloadLeaseTimeout, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="file leases need fcntl")
+
+def test_waiter_gets_lease_after_holder_releases(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    held = threading.Event()
+    release = threading.Event()
+    events = []
+
+    def holder():
+        with coordinator.lease("video"):
+            events.append("holder")
+            held.set()
+            release.wait(5)
+
+    def waiter():
+        with coordinator.lease("video", timeout=5):
+            events.append("waiter")
+
+    holder_thread = threading.Thread(target=holder)
+    holder_thread.start()
+    held.wait(5)
+    waiter_thread = threading.Thread(target=waiter)
+    waiter_thread.start()
+    time.sleep(0.2)
+    assert events == ["holder"]
+
+    release.set()
+    holder_thread.join(5)
+    waiter_thread.join(5)
+    assert events == ["holder", "waiter"]
+    # The last holder removes the lease file
+    assert not list(tmp_path.glob("*.lock"))
+
+def test_waiter_wakes_up_when_lease_is_released(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    held = threading.Event()
+    released_at = []
+    acquired_at = []
+
+    def holder():
+        with coordinator.lease("video"):
+            held.set()
+            time.sleep(1.5)
+            released_at.append(time.monotonic())
+
+    holder_thread = threading.Thread(target=holder)
+    holder_thread.start()
+    held.wait(5)
+    with coordinator.lease("video", timeout=5):
+        acquired_at.append(time.monotonic())
+    holder_thread.join(5)
+    # Not a poll interval later
+    assert acquired_at[0] - released_at[0] < 0.2
+
+def test_leases_are_exclusive(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    active = []
+    overlaps = []
+
+    def worker():
+        for _ in range(5):
+            with coordinator.lease("video", timeout=10):
+                active.append(1)
+                if len(active) > 1:
+                    overlaps.append(len(active))
+                time.sleep(0.01)
+                active.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    # Waiters that locked an already unlinked lease file must retry on the new one
+    assert overlaps == []
+
+def test_wait_times_out(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    with coordinator.lease("video"):
+        start_time = time.monotonic()
+        with pytest.raises(DownloadLeaseTimeout):
+            with coordinator.lease("video", timeout=0.3):
+                pass
+        assert time.monotonic() - start_time < 2
+
+    # The lease is still usable after a timed out wait
+    with coordinator.lease("video", timeout=1):
+        pass
+
+def test_other_keys_are_not_blocked(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    with coordinator.lease("video-a"):
+        with coordinator.lease("video-b", timeout=0.1):
+            pass
+
+def test_cleanup_stale_keeps_held_leases(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    stale = tmp_path / "dead.lock"
+    stale.write_text('{"pid": 0}')
+
+    with coordinator.lease("alive"):
+        assert coordinator.cleanup_stale() == 1
+        assert not stale.exists()
+        assert coordinator._lease_path("alive").exists()
+
+def test_lease_file_records_owner(tmp_path):
+    coordinator = DownloadCoordinator(lock_dir=tmp_path)
+    with coordinator.lease("video"):
+        assert f'"pid": {os.getpid()}' in coordinator._lease_path("video").read_text()
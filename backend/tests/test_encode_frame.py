@@ -0,0 +1,35 @@
+import io
+import os
+
+import pytest
+
+from PIL import Image
+
+from app.services.analyzer import encode_frame
+
+def _jpeg_file(path, size=(1280, 720)):
+    Image.new("RGB", size, "green").save(path, format="JPEG")
+    return path
+
+def _open_files(path):
+    return [fd for fd in os.listdir("/proc/self/fd") if os.path.realpath(f"/proc/self/fd/{fd}") == str(path)]
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_encode_frame_from_file_fits_max_size_and_closes_the_file(tmp_path):
+    path = _jpeg_file(tmp_path / "frame_0001.jpg")
+
+    payload = encode_frame(path, max_size=512, quality=80)
+
+    assert _open_files(path) == []
+
+    image = Image.open(io.BytesIO(payload))
+    assert image.format == "JPEG"
+    assert max(image.size) <= 512
+
+def test_encode_frame_leaves_in_memory_frames_untouched():
+    frame = Image.new("RGB", (1024, 768), "blue")
+
+    payload = encode_frame(frame, max_size=256, quality=80)
+
+    assert frame.size == (1024, 768)
+    assert max(Image.open(io.BytesIO(payload)).size) == 256
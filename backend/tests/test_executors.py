@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from app.core.executors import BoundedExecutor, ExecutorOverloaded
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=2)
+    yield executor
+    executor.shutdown(wait=True, cancel_futures=True)
+
+def test_admit_reserves_queue_slots(executor):
+    release = threading.Event()
+    executor.submit(release.wait, 5)  # Occupies the only worker
+
+    with executor.admit(2) as admission:
+        # Nothing submitted yet, but the reserved slots already count
+        with pytest.raises(ExecutorOverloaded):
+            executor.try_submit(lambda: None)
+        futures = [admission.submit(lambda: "done") for _ in range(2)]
+        with pytest.raises(RuntimeError):
+            admission.submit(lambda: None)
+
+    release.set()
+    assert [future.result(5) for future in futures] == ["done", "done"]
+
+def test_unused_admitted_slots_are_released(executor):
+    release = threading.Event()
+    executor.submit(release.wait, 5)
+
+    with executor.admit(2) as admission:
+        admission.submit(lambda: None)
+    assert executor.queued == 1
+
+    executor.try_submit(lambda: None)
+    with pytest.raises(ExecutorOverloaded):
+        executor.admit()
+    release.set()
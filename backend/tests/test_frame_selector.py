@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app.services.frame_selector import FrameSelectorService
+
+def _pattern(seed: int, noise: float = 0.0) -> Image.Image:
+    """A detailed frame; the same seed with a little noise is a near-duplicate."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(8, 8), dtype=np.uint8)
+    pixels = np.kron(base, np.ones((16, 16), dtype=np.uint8)).astype(np.float32)
+    if noise:
+        pixels += np.random.default_rng(seed + 1000).normal(0, noise, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "L").convert("RGB")
+
+def _blank() -> Image.Image:
+    return Image.new("RGB", (128, 128), "black")
+
+def test_short_videos_send_every_frame():
+    assert FrameSelectorService().select([_pattern(1), _blank()], budget=3) == [0, 1]
+
+def test_picks_distinct_scenes_over_duplicates_and_blank_frames():
+    frames = [_pattern(1), _pattern(1, noise=2), _pattern(1, noise=3), _blank(), _pattern(2), _pattern(3)]
+
+    selected = FrameSelectorService().select(frames, budget=3)
+
+    assert selected == sorted(selected)
+    assert 3 not in selected
+    assert len([index for index in selected if index <= 2]) == 1
+    assert 4 in selected and 5 in selected
+
+def test_leaves_the_budget_unused_rather_than_sending_duplicates():
+    frames = [_pattern(1), _pattern(1, noise=2), _blank(), _blank()]
+
+    assert len(FrameSelectorService().select(frames, budget=3)) == 1
+
+def test_unreadable_frames_fall_back_to_evenly_spaced(tmp_path):
+    frames = [tmp_path / f"missing_{index}.jpg" for index in range(5)]
+
+    assert FrameSelectorService().select(frames, budget=3) == [0, 2, 4]
+
+def test_reads_frame_files(tmp_path):
+    frames = []
+    for index, image in enumerate([_pattern(1), _pattern(1, noise=2), _pattern(2), _pattern(3)]):
+        path = Path(tmp_path / f"frame_{index:04d}.jpg")
+        image.save(path, format="JPEG", quality=95)
+        frames.append(path)
+
+    selected = FrameSelectorService().select(frames, budget=3)
+
+    assert len(selected) == 3
+    assert not {0, 1} <= set(selected)
@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import AnalysisJob
+from app.services import job_runner as job_runner_module
+from app.services.job_runner import AnalysisJobRunner
+
+class FakePipeline:
+    def __init__(self, runs):
+        self.runs = runs
+
+    def run(self, url, session, **kwargs):
+        self.runs.append(url)
+        return {"status": "success", "username": "creator"}
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(job_runner_module, "engine", engine)
+    return engine
+
+@pytest.fixture
+def make_runner(engine):
+    runners = []
+
+    def make(runs):
+        runner = AnalysisJobRunner(pipeline_factory=lambda: FakePipeline(runs), max_workers=1)
+        runners.append(runner)
+        return runner
+
+    yield make
+    for runner in runners:
+        runner.shutdown()
+
+def _add_job(engine, **fields) -> str:
+    with Session(engine) as session:
+        job = AnalysisJob(url="https://youtu.be/abc", **fields)
+        session.add(job)
+        session.commit()
+        return job.id
+
+def test_a_job_is_claimed_by_one_runner_only(engine, make_runner):
+    runs = []
+    job_id = _add_job(engine)
+    runners = [make_runner(runs) for _ in range(4)]
+
+    threads = [threading.Thread(target=runner._run, args=(job_id,)) for runner in runners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert runs == ["https://youtu.be/abc"]
+    with Session(engine) as session:
+        job = session.get(AnalysisJob, job_id)
+        assert job.status == "completed"
+        assert job.owner in {runner.owner_id for runner in runners}
+
+def test_only_jobs_of_dead_workers_are_failed(engine, make_runner):
+    runner = make_runner([])
+    old = datetime.utcnow() - timedelta(hours=1)
+    dead = _add_job(engine, status="running", owner="host:1:dead", heartbeat_at=old)
+    legacy = _add_job(engine, status="running")
+    alive = _add_job(engine, status="running", owner="host:2:alive", heartbeat_at=datetime.utcnow())
+    own = _add_job(engine, status="running", owner=runner.owner_id, heartbeat_at=old)
+
+    assert runner.fail_stale_jobs() == 2
+
+    with Session(engine) as session:
+        statuses = {job_id: session.get(AnalysisJob, job_id).status for job_id in (dead, legacy, alive, own)}
+    assert statuses == {dead: "failed", legacy: "failed", alive: "running", own: "running"}
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+from google.generativeai import protos
+from google.generativeai.types.generation_types import GenerateContentResponse
+
+from app.services.llm_client import LLMClient, TokenBucketLimiter, chunk_text
+
+def _chunk(texts, finish_reason=protos.Candidate.FinishReason.FINISH_REASON_UNSPECIFIED):
+    candidate = protos.Candidate(
+        content=protos.Content(parts=[protos.Part(text=text) for text in texts], role="model"),
+        finish_reason=finish_reason
+    )
+    return GenerateContentResponse.from_response(protos.GenerateContentResponse(candidates=[candidate]))
+
+def test_chunk_text_joins_text_parts():
+    assert chunk_text(_chunk(['{"title": ', '"Hi"'])) == '{"title": "Hi"'
+
+def test_chunk_text_skips_chunks_without_parts():
+    for chunk in (
+        _chunk([], protos.Candidate.FinishReason.MAX_TOKENS),
+        _chunk([], protos.Candidate.FinishReason.SAFETY),
+        GenerateContentResponse.from_response(protos.GenerateContentResponse()),
+    ):
+        assert chunk_text(chunk) == ""
+
+def test_requests_beyond_the_rpm_burst_wait_for_a_refill():
+    limiter = TokenBucketLimiter(rpm=120, tpm=0)  # 2 requests per second
+    for _ in range(120):
+        assert limiter.acquire(1) < 0.1
+
+    waited = limiter.acquire(1)
+
+    assert 0.3 < waited < 1.0
+
+def test_token_bucket_waits_for_enough_tokens():
+    limiter = TokenBucketLimiter(rpm=0, tpm=600)  # 10 tokens per second
+    limiter.acquire(600)
+
+    waited = limiter.acquire(5)
+
+    assert 0.3 < waited < 1.0
+
+def test_requests_larger_than_the_bucket_do_not_wait_forever():
+    limiter = TokenBucketLimiter(rpm=0, tpm=600)
+
+    assert limiter.acquire(10_000) < 0.1
+
+def test_adjust_returns_overestimated_tokens():
+    limiter = TokenBucketLimiter(rpm=0, tpm=600)
+    limiter.acquire(600)
+    # The request used 300 tokens less than estimated
+    limiter.adjust(-300)
+
+    assert limiter.acquire(300) < 0.1
+
+def test_zero_limits_are_not_enforced():
+    limiter = TokenBucketLimiter(rpm=0, tpm=0)
+    start_time = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire(10_000)
+
+    assert time.monotonic() - start_time < 0.5
+
+class _BlockingModel:
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def generate_content(self, contents, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        return contents
+
+def _client(model) -> LLMClient:
+    client = LLMClient.__new__(LLMClient)
+    client.model = model
+    client.limiter = TokenBucketLimiter(rpm=0, tpm=0)
+    client.concurrency = threading.BoundedSemaphore(1)
+    return client
+
+def test_generate_async_returns_the_response():
+    model = _BlockingModel()
+    model.release.set()
+
+    assert asyncio.run(_client(model).generate_async("prompt")) == "prompt"
+
+def test_cancelled_generate_async_releases_the_concurrency_slot():
+    model = _BlockingModel()
+    client = _client(model)
+
+    async def cancel_while_running():
+        task = asyncio.create_task(client.generate_async("prompt"))
+        await asyncio.to_thread(model.started.wait, 5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        model.release.set()
+
+    asyncio.run(cancel_while_running())
+    # The request finishes in its thread and gives the slot back
+    assert client.concurrency.acquire(timeout=5)
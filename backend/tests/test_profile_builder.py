@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import UserProfile
+from app.services.profile_builder import ProfileBuilderService
+
+class FakeLLM:
+    def __init__(self, text, before_return=None):
+        self.text = text
+        self.before_return = before_return
+
+    def generate(self, contents):
+        if self.before_return:
+            self.before_return()
+        return SimpleNamespace(text=self.text)
+
+def _setup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = UserProfile(username="creator", master_profile={"core_identity": "old"}, profile_version=3)
+        session.add(user)
+        session.commit()
+        return engine, user.id
+
+def test_save_profile_bumps_version(tmp_path):
+    engine, user_id = _setup(tmp_path)
+    builder = ProfileBuilderService()
+    builder.llm = FakeLLM('{"core_identity": "new"}')
+
+    with Session(engine) as session:
+        user = session.get(UserProfile, user_id)
+        assert builder._save_profile(user, "prompt", {"videos_count": 1}, 7, 0, session)
+        assert user.profile_version == 4
+        assert user.master_profile == {"core_identity": "new"}
+        assert user.profile_video_id == 7
+
+def test_save_profile_keeps_a_concurrently_saved_profile(tmp_path):
+    engine, user_id = _setup(tmp_path)
+
+    def concurrent_rebuild():
+        with Session(engine) as other_session:
+            other = other_session.get(UserProfile, user_id)
+            other.master_profile = {"core_identity": "concurrent"}
+            other.profile_version += 1
+            other_session.add(other)
+            other_session.commit()
+
+    builder = ProfileBuilderService()
+    builder.llm = FakeLLM('{"core_identity": "stale"}', before_return=concurrent_rebuild)
+
+    with Session(engine) as session:
+        user = session.get(UserProfile, user_id)
+        assert not builder._save_profile(user, "prompt", {}, 7, 0, session)
+        assert user.profile_version == 4
+        assert user.master_profile == {"core_identity": "concurrent"}
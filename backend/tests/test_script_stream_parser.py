@@ -0,0 +1,41 @@
+import json
+
+from app.services.generator import ScriptStreamParser
+
+SCRIPT = {
+    "title": 'Как я заработал "миллион"',
+    "script": [
+        {"time": "00:00-00:03", "visual": "Крупный план", "audio": "Вы думаете?"},
+        {"time": "00:03-00:10", "visual": "B-roll", "audio": "Нет"},
+    ],
+    "viral_tips": "Быстрая нарезка",
+}
+
+def _feed(text: str, chunk_size: int = 7) -> list:
+    parser = ScriptStreamParser()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events += parser.feed(text[start:start + chunk_size])
+    return events
+
+def test_title_first():
+    events = _feed("```json\n" + json.dumps(SCRIPT, ensure_ascii=False) + "\n```")
+
+    assert events[0] == ("title", SCRIPT["title"])
+    assert [data["item"] for event, data in events[1:]] == SCRIPT["script"]
+
+def test_title_after_other_keys():
+    reordered = {"viral_tips": SCRIPT["viral_tips"], "script": SCRIPT["script"], "title": SCRIPT["title"]}
+    events = _feed(json.dumps(reordered, ensure_ascii=False))
+
+    assert ("title", SCRIPT["title"]) in events
+    assert [event for event, _ in events].count("script_item") == 2
+
+def test_nested_title_keys_are_ignored():
+    script = {
+        "script": [{"title": "Сцена", "audio": 'Скажи "title": "нет"'}],
+        "title": "Настоящий",
+    }
+    events = _feed(json.dumps(script, ensure_ascii=False))
+
+    assert [data for event, data in events if event == "title"] == ["Настоящий"]
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.stage_graph import Stage, StageGraph
+
+@pytest.fixture
+def executors():
+    pools = {"default": ThreadPoolExecutor(max_workers=4), "single": ThreadPoolExecutor(max_workers=1)}
+    yield pools
+    for pool in pools.values():
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def test_stages_see_results_of_their_dependencies(executors):
+    graph = StageGraph([
+        Stage("download", lambda ctx: ctx["url"] + ".mp4"),
+        Stage("audio", lambda ctx: ctx["download"] + ".wav", deps=("download",)),
+        Stage("frames", lambda ctx: ctx["download"] + ".jpg", deps=("download",)),
+        Stage("analyze", lambda ctx: (ctx["audio"], ctx["frames"]), deps=("audio", "frames")),
+    ], executors)
+
+    run = graph.run({"url": "video"})
+
+    assert run.results["analyze"] == ("video.mp4.wav", "video.mp4.jpg")
+    assert run.critical_path[0] == "download" and run.critical_path[-1] == "analyze"
+
+def test_failure_is_reraised_and_dependents_never_run(executors):
+    ran = []
+
+    def fail(ctx):
+        raise RuntimeError("ffmpeg failed")
+
+    graph = StageGraph([
+        Stage("download", lambda ctx: "video.mp4"),
+        Stage("audio", fail, deps=("download",)),
+        Stage("transcribe", lambda ctx: ran.append("transcribe"), deps=("audio",)),
+    ], executors)
+
+    with pytest.raises(RuntimeError, match="ffmpeg failed"):
+        graph.run({})
+    assert ran == []
+
+def test_failure_cancels_stages_that_have_not_started(executors):
+    started = threading.Event()
+    ran = []
+
+    def fail(ctx):
+        started.wait(5)
+        raise RuntimeError("download failed")
+
+    def slow(ctx):
+        started.set()
+        time.sleep(0.2)
+        ran.append("slow")
+
+    graph = StageGraph([
+        Stage("download", fail),
+        Stage("slow", slow, executor="single"),
+        Stage("queued", lambda ctx: ran.append("queued"), executor="single"),
+    ], executors)
+
+    with pytest.raises(RuntimeError, match="download failed"):
+        graph.run({})
+    executors["single"].shutdown(wait=True)
+    # Already running stages finish, queued ones are cancelled
+    assert ran == ["slow"]
+
+def test_invalid_graphs_are_rejected(executors):
+    with pytest.raises(ValueError, match="Cycle"):
+        StageGraph([Stage("a", lambda ctx: 1, deps=("b",)), Stage("b", lambda ctx: 1, deps=("a",))], executors)
+    with pytest.raises(ValueError, match="Unknown stage"):
+        StageGraph([Stage("a", lambda ctx: 1, deps=("missing",))], executors)
+    with pytest.raises(ValueError, match="Unknown executor"):
+        StageGraph([Stage("a", lambda ctx: 1, executor="gpu")], executors)
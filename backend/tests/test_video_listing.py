@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.api.endpoints import _decode_cursor, _encode_cursor, _list_videos
+from app.models import UserProfile, VideoAnalysis
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def _add_videos(session: Session) -> int:
+    creator = UserProfile(username="creator")
+    other = UserProfile(username="other")
+    session.add_all([creator, other])
+    session.commit()
+
+    start = datetime(2026, 1, 1)
+    # Repeated view / like counts, so pages have to break ties by id
+    for index in range(7):
+        session.add(VideoAnalysis(
+            user_id=creator.id,
+            youtube_url=f"https://youtu.be/{index}",
+            title=f"Video {index}",
+            view_count=[100, 50, 100, 10, 50, 100, 0][index],
+            like_count=index % 2,
+            platform="YouTube",
+            created_at=start + timedelta(hours=index)
+        ))
+    session.add(VideoAnalysis(user_id=other.id, youtube_url="https://youtu.be/x", title="Other", platform="YouTube"))
+    session.commit()
+    return creator.id
+
+def _all_pages(session: Session, user_id: int, sort: str, limit: int) -> list:
+    ids = []
+    cursor = None
+    while True:
+        page = _list_videos(session, user_id, sort, limit, cursor)
+        assert len(page.videos) <= limit
+        ids += [video.id for video in page.videos]
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("sort, key", [
+    ("recent", lambda video: (video.created_at, video.id)),
+    ("views", lambda video: (video.view_count, video.id)),
+    ("likes", lambda video: (video.like_count, video.id)),
+])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 20])
+def test_pages_cover_every_video_once_in_order(session, sort, key, limit):
+    user_id = _add_videos(session)
+    videos = session.exec(select(VideoAnalysis).where(VideoAnalysis.user_id == user_id)).all()
+    expected = [video.id for video in sorted(videos, key=key, reverse=True)]
+
+    assert _all_pages(session, user_id, sort, limit) == expected
+
+def test_last_page_has_no_cursor(session):
+    user_id = _add_videos(session)
+
+    assert _list_videos(session, user_id, "recent", 7).next_cursor is None
+    assert _list_videos(session, user_id, "recent", 6).next_cursor is not None
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 891011)
+
+    assert _decode_cursor(_encode_cursor("recent", created_at, 42), "recent") == (created_at, 42)
+    assert _decode_cursor(_encode_cursor("views", 1000, 7), "views") == (1000, 7)
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", _encode_cursor("views", 10, 1)])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor, "recent")
+    assert error.value.status_code == 400
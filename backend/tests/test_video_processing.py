@@ -0,0 +1,34 @@
+import io
+import shutil
+import subprocess
+
+import pytest
+from PIL import Image
+
+from app.services.video_processing import VideoProcessingService
+
+def _jpeg(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 16), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def test_split_jpegs_returns_every_frame_of_an_image2pipe_stream():
+    images = VideoProcessingService()._split_jpegs(_jpeg("red") + _jpeg("blue") + b"\xff\xd8truncated")
+
+    assert len(images) == 2
+    assert [image.size for image in images] == [(32, 16), (32, 16)]
+    assert images[1].convert("RGB").getpixel((0, 0))[2] > 200
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs the ffmpeg binary")
+def test_load_keyframes_returns_a_frame_per_timestamp(tmp_path):
+    video = tmp_path / "video.mp4"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=duration=4:size=320x240:rate=25",
+         "-g", "25", str(video)],
+        check=True
+    )
+
+    images = VideoProcessingService().load_keyframes(video, timestamps=[0.0, 1.5, 3.9], max_size=128)
+
+    assert len(images) == 3
+    assert all(max(image.size) == 128 for image in images)
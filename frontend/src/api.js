@@ -56,7 +56,8 @@ apiClient.interceptors.response.use(
  * @property {string} status - Status ("success")
  * @property {number} video_id - Database ID of the video
  * @property {string} username - Creator's username
- * @property {string} transcript_text - Transcript (empty if not stored in DB)
+ * @property {string} transcript_text - Stored transcript (empty for analyses saved before transcripts were persisted)
+ * @property {Array<{start: number, end: number, text: string}>} segments - Stored transcript segments with timestamps
  * @property {Object.<string, any>} [style_passport] - Style analysis result
  * @property {Object.<string, any>} [meta_stats] - Video metadata
  * @property {string} youtube_url - Original video URL
@@ -67,8 +68,21 @@ apiClient.interceptors.response.use(
  * @typedef {Object} ProfileResponse
  * @property {string} username - Creator's username
  * @property {Object.<string, any>} master_profile - Master DNA profile
+ * @property {number} profile_version - Incremented on every Master DNA update (updates run in the background after an analysis)
  * @property {number} videos_count - Total number of analyzed videos
- * @property {Array<{id: number, title: string, url: string, views: number, created_at: string}>} videos - List of analyzed videos
+ * @property {Array<ProfileVideo>} videos - First page of analyzed videos, newest first
+ * @property {string|null} next_cursor - Cursor for getProfileVideos, null if all videos are in `videos`
+ */
+
+/**
+ * @typedef {Object} ProfileVideo
+ * @property {number} id - Video database ID
+ * @property {string} title - Video title
+ * @property {string} url - Original video URL
+ * @property {number} views - View count
+ * @property {number} likes - Like count
+ * @property {string} platform - Platform name
+ * @property {string} created_at - Analysis date
  */
 
 /**
@@ -138,6 +152,74 @@ export const api = {
     }
   },
 
+  /**
+   * Queues a video for background analysis. Returns immediately with a job id.
+   * @param {string} url - Video URL (YouTube, TikTok, Reels, Shorts)
+   * @returns {Promise<{job_id: string, status: string}>} Created job
+   * @throws {ApiError} If the job could not be created
+   */
+  submitAnalysisJob: async (url) => {
+    try {
+      const response = await apiClient.post('/analyze/jobs', { url });
+      return response.data;
+    } catch (error) {
+      console.error('API Error (submitAnalysisJob):', error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
+  /**
+   * Gets status of a background analysis job.
+   * @param {string} jobId - Job ID returned by submitAnalysisJob
+   * @returns {Promise<{job_id: string, status: string, error?: string, result?: AnalyzeResponse}>} Job status; result is set once completed
+   * @throws {ApiError} If job not found (404) or other error
+   */
+  getAnalysisJob: async (jobId) => {
+    try {
+      const response = await apiClient.get(`/analyze/jobs/${jobId}`);
+      return response.data;
+    } catch (error) {
+      console.error(`API Error (getAnalysisJob) for job ${jobId}:`, error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
+  /**
+   * Submits many videos for background analysis: a list of URLs and/or a channel/playlist URL.
+   * @param {{urls?: string[], channel_url?: string, limit?: number, force?: boolean}} request - Videos to analyze
+   * @returns {Promise<{batch_id: string, status: string, total: number}>} Batch ID to poll with getBulkAnalysis
+   * @throws {ApiError} If no videos were found, the channel can't be expanded (400) or other error
+   */
+  submitBulkAnalysis: async (request) => {
+    try {
+      const response = await apiClient.post('/analyze/bulk', request);
+      return response.data;
+    } catch (error) {
+      console.error('API Error (submitBulkAnalysis):', error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
+  /**
+   * Gets progress of a bulk analysis.
+   * @param {string} batchId - Batch ID returned by submitBulkAnalysis
+   * @returns {Promise<{batch_id: string, status: string, total: number, counts: Object<string, number>, jobs: Array<{job_id: string, url: string, status: string, error?: string, video_id?: number}>}>} Batch status with every video job
+   * @throws {ApiError} If batch not found (404) or other error
+   */
+  getBulkAnalysis: async (batchId) => {
+    try {
+      const response = await apiClient.get(`/analyze/bulk/${batchId}`);
+      return response.data;
+    } catch (error) {
+      console.error(`API Error (getBulkAnalysis) for batch ${batchId}:`, error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
   /**
    * Gets full video analysis by video ID.
    * @param {number} id - Video database ID
@@ -172,16 +254,35 @@ export const api = {
     }
   },
 
+  /**
+   * Pages through a creator's analyzed videos.
+   * @param {string} username - Creator's username
+   * @param {{sort?: 'recent'|'views'|'likes', limit?: number, cursor?: string}} [options] - Sort order, page size and `next_cursor` of the previous page
+   * @returns {Promise<{videos: Array<ProfileVideo>, next_cursor: string|null}>} One page of videos
+   * @throws {ApiError} If user not found (404), invalid cursor (400) or other error
+   */
+  getProfileVideos: async (username, options = {}) => {
+    try {
+      const response = await apiClient.get(`/profile/${username}/videos`, { params: options });
+      return response.data;
+    } catch (error) {
+      console.error(`API Error (getProfileVideos) for username ${username}:`, error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
   /**
    * Generates a new script based on the creator's Master DNA.
    * @param {string} username - Creator's username (must have analyzed videos first)
    * @param {string} topic - Topic for the new video
+   * @param {boolean} [regenerate=false] - Generate a new script even if one was already generated for this topic
    * @returns {Promise<GenerateResponse>} Generated script with title, script blocks, and viral tips
    * @throws {ApiError} If user not found (404), no master profile (404), or generation fails
    */
-  generateScript: async (username, topic) => {
+  generateScript: async (username, topic, regenerate = false) => {
     try {
-      const response = await apiClient.post('/generate', { username, topic });
+      const response = await apiClient.post('/generate', { username, topic, regenerate });
       return response.data;
     } catch (error) {
       console.error(`API Error (generateScript) for username ${username}:`, error);
@@ -189,6 +290,87 @@ export const api = {
       throw formattedError;
     }
   },
+
+  /**
+   * Generates scripts for several topics at once (e.g. a week of videos).
+   * @param {string} username - Creator's username (must have analyzed videos first)
+   * @param {string[]} topics - Topics for the new videos
+   * @param {boolean} [regenerate=false] - Generate new scripts even for topics generated before
+   * @returns {Promise<{status: string, results: Array<{topic: string, status: string, script_data?: Object, error?: string}>}>} Per-topic results; status is "success", "partial" or "error"
+   * @throws {ApiError} If user not found (404), no master profile (404), or the request is invalid
+   */
+  generateScriptBatch: async (username, topics, regenerate = false) => {
+    try {
+      const response = await apiClient.post('/generate/batch', { username, topics, regenerate });
+      return response.data;
+    } catch (error) {
+      console.error(`API Error (generateScriptBatch) for username ${username}:`, error);
+      const formattedError = formatError(error);
+      throw formattedError;
+    }
+  },
+
+  /**
+   * Streams a new script over Server-Sent Events. The title and every finished script block
+   * are passed to the callbacks as soon as the model produces them.
+   * @param {string} username - Creator's username (must have analyzed videos first)
+   * @param {string} topic - Topic for the new video
+   * @param {{onTitle?: function(string), onScriptItem?: function(Object, number)}} [handlers] - Partial result callbacks
+   * @param {boolean} [regenerate=false] - Generate a new script even if one was already generated for this topic
+   * @returns {Promise<Object.<string, any>>} Complete script data (same as GenerateResponse.script_data)
+   * @throws {ApiError} If user not found (404), no master profile (404), or generation fails
+   */
+  streamScript: async (username, topic, handlers = {}, regenerate = false) => {
+    const token = localStorage.getItem('token');
+    let response;
+    try {
+      response = await fetch(`${API_BASE_URL}/generate/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({ username, topic, regenerate }),
+      });
+    } catch (error) {
+      console.error(`API Error (streamScript) for username ${username}:`, error);
+      throw { message: 'No response from server. Please check your connection and ensure the backend server is running.', status: null, response: null };
+    }
+
+    if (!response.ok) {
+      const data = await response.json().catch(() => null);
+      throw { message: data?.detail || response.statusText, status: response.status, response: data };
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] ?? 'null');
+        if (event === 'title') {
+          handlers.onTitle?.(data);
+        } else if (event === 'script_item') {
+          handlers.onScriptItem?.(data.item, data.index);
+        } else if (event === 'done') {
+          return data;
+        } else if (event === 'error') {
+          throw { message: data?.detail || 'Script generation failed', status: null, response: data };
+        }
+      }
+    }
+    throw { message: 'Script stream ended unexpectedly', status: null, response: null };
+  },
 };
 
 export default api;
@@ -86,8 +86,12 @@ const GeneratorPage = () => {
     setGeneratedScript(null);
     
     try {
-      const data = await api.generateScript(profile.username, topic.trim());
-      setGeneratedScript(data.script_data);
+      // Render the title and script blocks as they arrive, the hook comes first
+      const scriptData = await api.streamScript(profile.username, topic.trim(), {
+        onTitle: (title) => setGeneratedScript((prev) => ({ ...prev, title, script: prev?.script || [] })),
+        onScriptItem: (item) => setGeneratedScript((prev) => ({ ...prev, script: [...(prev?.script || []), item] })),
+      });
+      setGeneratedScript(scriptData);
     } catch (err) {
       console.error('Generation error:', err);
       setGenerateError(err.message || 'Ошибка при генерации сценария');
@@ -248,7 +252,7 @@ const GeneratorPage = () => {
           {profile.videos && profile.videos.length > 0 && (
             <div className="glass-card p-6">
               <h3 className="text-sm font-bold text-gray-400 mb-3 uppercase tracking-wider">
-                Прошлые видео ({profile.videos.length})
+                Прошлые видео ({profile.videos_count})
               </h3>
               <div className="space-y-3 max-h-64 overflow-y-auto">
                 {profile.videos.slice(0, 5).map((video) => (
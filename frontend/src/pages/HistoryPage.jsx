@@ -30,6 +30,9 @@ const HistoryPage = () => {
   const navigate = useNavigate();
   const { user } = useAuth();
   const [profile, setProfile] = useState(null);
+  const [videos, setVideos] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -53,6 +56,8 @@ const HistoryPage = () => {
       // Use current authenticated user's username
       const data = await api.getProfile(user.username);
       setProfile(data);
+      setVideos(data.videos || []);
+      setNextCursor(data.next_cursor || null);
     } catch (err) {
       console.error('Error loading profile:', err);
       setError(err.message || 'Ошибка при загрузке истории');
@@ -61,6 +66,22 @@ const HistoryPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor || isLoadingMore) return;
+
+    setIsLoadingMore(true);
+    try {
+      const page = await api.getProfileVideos(user.username, { cursor: nextCursor });
+      setVideos((current) => [...current, ...page.videos]);
+      setNextCursor(page.next_cursor || null);
+    } catch (err) {
+      console.error('Error loading more videos:', err);
+      setError(err.message || 'Ошибка при загрузке истории');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleVideoClick = (videoId) => {
     navigate(`/dashboard/analysis/${videoId}`);
   };
@@ -99,7 +120,7 @@ const HistoryPage = () => {
     );
   }
 
-  const videos = profile?.videos || [];
+  const videosCount = profile?.videos_count ?? videos.length;
   const lastVideoDate = videos.length > 0 ? videos[0].created_at : null;
 
   return (
@@ -128,7 +149,7 @@ const HistoryPage = () => {
               <TrendingUp className="w-5 h-5 text-neon" />
               <span className="text-gray-400 text-sm">Всего анализов</span>
             </div>
-            <p className="text-3xl font-bold text-white">{videos.length}</p>
+            <p className="text-3xl font-bold text-white">{videosCount}</p>
           </div>
           {lastVideoDate && (
             <div className="glass-card p-6">
@@ -174,7 +195,7 @@ const HistoryPage = () => {
               key={video.id}
               initial={{ opacity: 0, y: 20 }}
               animate={{ opacity: 1, y: 0 }}
-              transition={{ duration: 0.6, delay: 0.2 + index * 0.1 }}
+              transition={{ duration: 0.6, delay: 0.2 + (index % 20) * 0.1 }}
               className="glass-card overflow-hidden group hover:neon-glow transition-all cursor-pointer flex flex-col h-full"
               onClick={() => handleVideoClick(video.id)}
             >
@@ -238,6 +259,20 @@ const HistoryPage = () => {
           ))}
         </div>
       )}
+
+      {/* Load More */}
+      {nextCursor && (
+        <div className="text-center mt-12">
+          <button
+            onClick={loadMore}
+            disabled={isLoadingMore}
+            className="primary-btn px-6 py-3 inline-flex items-center gap-2"
+          >
+            {isLoadingMore ? <Loader2 className="w-5 h-5 animate-spin" /> : <ArrowRight className="w-5 h-5" />}
+            Загрузить ещё
+          </button>
+        </div>
+      )}
     </div>
   );
 };